@@ -0,0 +1,126 @@
+"""Throughput of queue workers against a local stub news site.
+
+Serves a synthetic site where each source lives on its own loopback host
+(127.0.0.1, 127.0.0.2, ...), so per-host politeness still applies. It then
+drains one enqueue cycle with 1, 2, 4, ... worker processes and reports
+articles per second for each worker count.
+
+    python bench_workers.py --workers 1,2,4,8 --sources 16 --articles 6
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from scrape_queue import WorkQueue, enqueue_sources, run_worker
+
+PARAGRAPH = ("<p>Fund managers rotated into financial services and energy names this week while "
+             "trimming exposure to consumer stocks, according to the latest portfolio disclosures.</p>")
+
+
+class StubSiteHandler(BaseHTTPRequestHandler):
+    latency = 0.05
+    articles = 6
+
+    def do_GET(self):
+        time.sleep(self.latency)
+        host = self.headers.get('Host')
+        if self.path.endswith('/news/'):
+            links = "".join(
+                f'<a class="subtle-link" href="http://{host}/article/{i}">Story {i}</a>'
+                for i in range(self.articles)
+            )
+            body = f"<html><body>{links}</body></html>"
+        else:
+            body = (f"<html><body><h1>Stub story {self.path}</h1><time datetime=\"2025-04-09T06:54:07Z\"></time>"
+                    f"<div class=\"caas-body\">{PARAGRAPH * 4}</div></body></html>")
+        data = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/html')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def stub_sources(n_sources, port):
+    return {
+        f"STUB{i}": {
+            'main_url': f"http://127.0.0.{i + 1}:{port}/news/",
+            'link_patterns': ['a.subtle-link'],
+            'article_selectors': {'title': 'h1', 'content': 'div.caas-body', 'date': 'time'},
+            'exclude_patterns': []
+        }
+        for i in range(n_sources)
+    }
+
+
+def _worker(db_path, sources, politeness, profile_path):
+    run_worker(db_path, sources, politeness=politeness, poll_interval=0.02,
+               exit_when_drained=True, profile_path=profile_path)
+
+
+def drain(n_workers, sources, args, workdir):
+    db_path = os.path.join(workdir, f"queue_{n_workers}.db")
+    queue = WorkQueue(db_path)
+    enqueue_sources(queue, sources, limit_per_source=args.articles)
+
+    start = time.perf_counter()
+    procs = [
+        multiprocessing.Process(
+            target=_worker,
+            args=(db_path, sources, (args.politeness, args.politeness), os.path.join(workdir, f"profiles_{i}.json"))
+        )
+        for i in range(n_workers)
+    ]
+    for proc in procs:
+        proc.start()
+    for proc in procs:
+        proc.join()
+    elapsed = time.perf_counter() - start
+
+    articles = sum(1 for row in queue.done_articles() if json.loads(row['result']))
+    return {"workers": n_workers, "seconds": elapsed, "articles": articles,
+            "articles_per_s": articles / elapsed, "queue": queue.stats()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,2,4,8')
+    parser.add_argument('--sources', type=int, default=16)
+    parser.add_argument('--articles', type=int, default=6)
+    parser.add_argument('--latency', type=float, default=0.05, help='Stub response delay in seconds')
+    parser.add_argument('--politeness', type=float, default=0.1, help='Per-host delay in seconds')
+    args = parser.parse_args()
+
+    StubSiteHandler.latency = args.latency
+    StubSiteHandler.articles = args.articles
+    server = ThreadingHTTPServer(('', 0), StubSiteHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    sources = stub_sources(args.sources, server.server_address[1])
+
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)  # the scraper creates scraped_mf/ in the working directory
+        try:
+            for n_workers in [int(w) for w in args.workers.split(',')]:
+                results.append(drain(n_workers, sources, args, workdir))
+        finally:
+            os.chdir(cwd)
+    server.shutdown()
+
+    base = results[0]['articles_per_s'] / results[0]['workers']
+    for result in results:
+        result['scaling_efficiency'] = result['articles_per_s'] / (base * result['workers'])
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
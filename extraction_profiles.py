@@ -0,0 +1,139 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+
+@contextmanager
+def _file_lock(path, timeout=10, stale_after=60):
+    """Cross-process lock held as a directory, since mkdir is atomic everywhere"""
+    lock_path = f"{path}.lock"
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            os.mkdir(lock_path)
+            break
+        except FileExistsError:
+            try:
+                # A process that died while saving leaves its lock behind
+                if time.time() - os.path.getmtime(lock_path) > stale_after:
+                    os.rmdir(lock_path)
+                    continue
+            except OSError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Timed out waiting for {lock_path}")
+            time.sleep(0.05)
+    try:
+        yield
+    finally:
+        os.rmdir(lock_path)
+
+
+class ExtractionProfiles:
+    """Remembers, per source, which fallback selector and date format won last time.
+
+    Each (source, field) entry holds the latest winning value together with
+    how often trying the learned winner first paid off. The counts are
+    cumulative across winner changes, so profiles that have gone stale after
+    a site redesign, or that keep flipping between templates, can be spotted
+    from their hit rate. Several workers can share one file: save() adds
+    this process's new counts to whatever is on disk instead of overwriting it.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        # Hits and misses recorded since the last save, keyed by (source, field)
+        self._pending = {}
+        self.profiles = self._read()
+
+    def _read(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (json.JSONDecodeError, OSError) as e:
+            print(f"Ignoring unreadable extraction profiles {self.path}: {str(e)}")
+            return {}
+
+    def preferred(self, source_name, field):
+        """Return the learned winner for this field, or None"""
+        entry = self.profiles.get(source_name, {}).get(field)
+        return entry['winner'] if entry else None
+
+    def ordered(self, source_name, field, candidates):
+        """Candidates with the learned winner moved to the front"""
+        winner = self.preferred(source_name, field)
+        if winner is None or winner not in candidates:
+            return list(candidates)
+        return [winner] + [c for c in candidates if c != winner]
+
+    def record(self, source_name, field, winner):
+        """Record the value that worked; winner=None means nothing matched"""
+        with self._lock:
+            fields = self.profiles.setdefault(source_name, {})
+            entry = fields.get(field)
+            if entry is None:
+                if winner is not None:
+                    fields[field] = {'winner': winner, 'hits': 0, 'misses': 0}
+                    self._pending.setdefault((source_name, field), {'hits': 0, 'misses': 0})
+                return
+            pending = self._pending.setdefault((source_name, field), {'hits': 0, 'misses': 0})
+            if winner == entry['winner']:
+                entry['hits'] += 1
+                pending['hits'] += 1
+            else:
+                # Counts carry over, so a source flipping between two templates still shows up as stale
+                if winner is not None:
+                    entry['winner'] = winner
+                entry['misses'] += 1
+                pending['misses'] += 1
+
+    def hit_rates(self):
+        """Hit rate of every learned winner, keyed by (source, field)"""
+        rates = {}
+        for source_name, fields in self.profiles.items():
+            for field, entry in fields.items():
+                attempts = entry['hits'] + entry['misses']
+                rates[(source_name, field)] = entry['hits'] / attempts if attempts else None
+        return rates
+
+    def stale(self, min_attempts=10, min_hit_rate=0.5):
+        """Profiles that have been tried enough and mostly miss"""
+        stale = []
+        for (source_name, field), rate in self.hit_rates().items():
+            entry = self.profiles[source_name][field]
+            if entry['hits'] + entry['misses'] >= min_attempts and rate < min_hit_rate:
+                stale.append((source_name, field, rate))
+        return stale
+
+    def save(self):
+        """Merge this process's new counts into the file; the latest winner seen here wins"""
+        if not self.path:
+            return
+        with self._lock:
+            try:
+                with _file_lock(self.path):
+                    merged = self._read()
+                    for (source_name, field), delta in self._pending.items():
+                        ours = self.profiles[source_name][field]
+                        entry = merged.setdefault(source_name, {}).setdefault(
+                            field, {'winner': ours['winner'], 'hits': 0, 'misses': 0}
+                        )
+                        entry['winner'] = ours['winner']
+                        entry['hits'] += delta['hits']
+                        entry['misses'] += delta['misses']
+
+                    tmp_path = f"{self.path}.tmp"
+                    with open(tmp_path, 'w', encoding='utf-8') as f:
+                        json.dump(merged, f, indent=2)
+                    os.replace(tmp_path, self.path)
+            except TimeoutError as e:
+                # Keep the pending counts for the next save
+                print(f"Could not save extraction profiles: {str(e)}")
+                return
+            self.profiles = merged
+            self._pending = {}
@@ -1,20 +1,20 @@
-from flask import Flask, request, jsonify
-from backend import load_or_create_qa_chain
+import os
+import json
+import time
+from flask import Flask, Response, request, jsonify, stream_with_context
+from backend import load_live_index, index_version, answer_batch
+from coalesce import SingleFlight, normalize_question
+from fund_facts import FundFactsTable, FactRouter
+from instrumentation import start_trace, export_stats, render_metrics, observe_route
+from snapshots import LiveIndex
 
-app = Flask(__name__)
-qa_chain = load_or_create_qa_chain()
+MAX_BATCH_QUESTIONS = 100
+BATCH_CONCURRENCY = 4
+# Longest a request waits on an identical question someone else is answering
+ASK_WAIT_SECONDS = 60
 
-@app.route("/ask", methods=["POST"])
-def ask_question():
-    data = request.json
-    question = data.get("question", "")
-
-    if not question:
-        return jsonify({"error": "Please provide a question."}), 400
-
-    response = qa_chain.invoke(question)
-    
-    return jsonify({
+def format_response(response):
+    return {
         "answer": response["result"],
         "sources": [
             {
@@ -22,7 +22,123 @@ def ask_question():
                 "content_snippet": doc.page_content[:100]
             } for doc in response["source_documents"]
         ]
-    })
+    }
+
+def create_app(qa_chain=None, db_path='./chroma_db', folder_path=None, facts=None, reload_interval=5.0):
+    app = Flask(__name__)
+    folder_path = folder_path or os.getcwd()
+    # Newly published index snapshots, and the facts table built with them, are picked up without a restart
+    if qa_chain is None:
+        live = load_live_index(folder_path, db_path, check_interval=reload_interval, facts=facts)
+    else:
+        if facts is None:
+            facts = FundFactsTable.from_folder(folder_path)
+        live = LiveIndex.fixed(qa_chain, index_version(db_path), facts)
+    export_stats("rag_index", live.stats, "Index snapshot hot reloads")
+
+    # Plain fund fact lookups are answered from the snapshot's parsed table without the LLM
+    router = FactRouter()
+    export_stats("rag_routing", router.stats, "Questions answered by each path")
+
+    # Identical questions arriving together share one chain invocation
+    coalescer = SingleFlight()
+    export_stats("rag_coalescing", coalescer.stats, "Single-flight coalescing of /ask")
+
+    @app.route("/ask", methods=["POST"])
+    def ask_question():
+        trace = start_trace(request.headers.get("X-Trace-Id"))
+        data = request.json
+        question = data.get("question", "")
+
+        if not question:
+            return jsonify({"error": "Please provide a question."}), 400
+
+        start = time.perf_counter()
+        # The whole request stays on one snapshot even if a newer one is swapped in meanwhile
+        with live.use() as (version, qa_chain, snapshot_facts):
+            fact_answer = router.answer(question, snapshot_facts)
+            if fact_answer is not None:
+                resp = jsonify({**fact_answer, "route": "facts"})
+                route = "facts"
+            else:
+                with trace.stage("total"):
+                    key = (normalize_question(question), version)
+                    try:
+                        response = coalescer.do(
+                            key, lambda: trace.invoke(qa_chain, question), timeout=ASK_WAIT_SECONDS
+                        )
+                    except TimeoutError:
+                        # A hung chain call must not pin every caller that coalesced onto it
+                        resp = jsonify({"error": "Timed out waiting for the answer, please retry."})
+                        resp.status_code = 504
+                    else:
+                        with trace.stage("serialize"):
+                            resp = jsonify({**format_response(response), "route": "rag"})
+                route = "rag"
+        router.record(route)
+        observe_route(route, time.perf_counter() - start)
+
+        if trace.trace_id:
+            resp.headers["X-Trace-Id"] = trace.trace_id
+        return resp
+
+    @app.route("/ask_batch", methods=["POST"])
+    def ask_batch():
+        data = request.json or {}
+        questions = data.get("questions", [])
+
+        if not isinstance(questions, list) or not questions or not all(isinstance(q, str) and q.strip() for q in questions):
+            return jsonify({"error": "Please provide a non-empty list of questions."}), 400
+        if len(questions) > MAX_BATCH_QUESTIONS:
+            return jsonify({"error": f"At most {MAX_BATCH_QUESTIONS} questions per batch."}), 400
+
+        # One JSON object per line, in completion order, tagged with the question's index
+        def stream():
+            # Facts and RAG answers in one batch come from the same snapshot
+            with live.use() as (_, qa_chain, snapshot_facts):
+                rag_indices = []
+                for index, question in enumerate(questions):
+                    start = time.perf_counter()
+                    fact_answer = router.answer(question, snapshot_facts)
+                    if fact_answer is None:
+                        rag_indices.append(index)
+                        continue
+                    router.record("facts")
+                    observe_route("facts", time.perf_counter() - start)
+                    yield json.dumps({"index": index, "question": question, **fact_answer, "route": "facts"}) + "\n"
+
+                rag_questions = [questions[index] for index in rag_indices]
+                start = time.perf_counter()
+                for j, response, error in answer_batch(qa_chain, rag_questions, BATCH_CONCURRENCY):
+                    index = rag_indices[j]
+                    router.record("rag")
+                    # Includes waiting behind the batch's other generations, so kept apart from /ask's "rag"
+                    observe_route("rag_batch", time.perf_counter() - start)
+                    if error is not None:
+                        item = {"index": index, "question": questions[index], "error": str(error)}
+                    else:
+                        item = {"index": index, "question": questions[index], **format_response(response), "route": "rag"}
+                    yield json.dumps(item) + "\n"
+
+        return Response(stream_with_context(stream()), mimetype="application/x-ndjson")
+
+    @app.route("/stats", methods=["GET"])
+    def stats():
+        return jsonify({
+            "coalescing": coalescer.stats(),
+            "routing": router.stats(),
+            "index": {"version": live.version, **live.stats()}
+        })
+
+    @app.route("/metrics", methods=["GET"])
+    def metrics():
+        rendered = render_metrics()
+        if rendered is None:
+            return "Metrics are disabled.", 404
+        body, content_type = rendered
+        return Response(body, content_type=content_type)
+
+    return app
 
 if __name__ == "__main__":
-    app.run(debug=True)
+    create_app().run(debug=True)
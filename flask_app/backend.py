@@ -1,14 +1,20 @@
 import os
 import json
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_community.llms import HuggingFaceHub
 from langchain.chains import RetrievalQA
+from coalesce import normalize_question
+from docstore import CompactDocStore, CompactRetriever, index_vectors
+from instrumentation import instrument_embeddings
+from shards import ShardedRetriever, is_sharded, load_sharded_retriever
+from fund_facts import FundFactsTable
+from snapshots import LiveIndex, build_snapshot, current_version, facts_path, is_snapshot_root, publish, snapshot_path
 
-def load_or_create_qa_chain():
-    folder_path = os.getcwd()
+def load_documents(folder_path):
     all_docs = []
 
     for filename in os.listdir(folder_path):
@@ -34,28 +40,169 @@ def load_or_create_qa_chain():
                 except json.JSONDecodeError:
                     print(f"Skipping bad JSON: {filename}")
 
-    text_splitter = RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
-    chunked_docs = text_splitter.split_documents(all_docs)
+    return all_docs
 
-    embedding_model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
-    db_path = './chroma_db'
-    if os.path.exists(db_path):
-        db = Chroma(persist_directory=db_path, embedding_function=embedding_model)
-    else:
-        db = Chroma.from_documents(chunked_docs, embedding=embedding_model, persist_directory=db_path)
-        db.persist()
+def text_splitter():
+    return RecursiveCharacterTextSplitter(chunk_size=500, chunk_overlap=100)
 
-    llm = HuggingFaceHub(
+def split_documents(docs):
+    return text_splitter().split_documents(docs)
+
+def default_embedding_model():
+    # RAG_EMBEDDINGS=onnx or onnx-int8 serves an exported copy of the same model without torch
+    backend = os.environ.get("RAG_EMBEDDINGS", "torch")
+    if backend in ("onnx", "onnx-int8"):
+        from onnx_embeddings import DEFAULT_MODEL_DIR, OnnxEmbeddings
+        model_dir = os.environ.get("RAG_ONNX_MODEL_DIR", DEFAULT_MODEL_DIR)
+        return OnnxEmbeddings(model_dir, quantized=backend == "onnx-int8")
+    return HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+
+def default_llm():
+    return HuggingFaceHub(
         repo_id="mistralai/Mistral-7B-Instruct-v0.1",
         model_kwargs={"temperature": 0.7, "max_new_tokens": 512}
     )
 
-    retriever = db.as_retriever(search_kwargs={"k": 4})
-    qa_chain = RetrievalQA.from_chain_type(
+def docstore_path(db_path):
+    return os.path.join(db_path, 'docstore')
+
+def create_index(folder_path, db_path, embedding_model):
+    """Chunk the corpus into a compact docstore and index only its vectors in Chroma"""
+    store = CompactDocStore.from_folder(folder_path, text_splitter())
+    db = Chroma(persist_directory=db_path, embedding_function=embedding_model)
+    index_vectors(db, store, embedding_model)
+    store.save(docstore_path(db_path))
+    return db, store
+
+def load_index(db_path, embedding_model):
+    """Returns (db, store); store is None for indexes that keep documents inside Chroma"""
+    db = Chroma(persist_directory=db_path, embedding_function=embedding_model)
+    if os.path.exists(docstore_path(db_path)):
+        return db, CompactDocStore.load(docstore_path(db_path))
+    return db, None
+
+def build_retriever(db, store, k=4):
+    if store is None:
+        return db.as_retriever(search_kwargs={"k": k})
+    return CompactRetriever(vectorstore=db, store=store, search_kwargs={"k": k})
+
+def build_qa_chain(retriever, llm):
+    return RetrievalQA.from_chain_type(
         llm=llm,
         chain_type="stuff",
         retriever=retriever,
         return_source_documents=True
     )
 
-    return qa_chain
+def load_unversioned_retriever(db_path, embedding_model, k=4):
+    """Retriever for an index built before snapshots: sharded, or a single Chroma collection"""
+    if is_sharded(db_path):
+        return load_sharded_retriever(db_path, embedding_model, k)
+    db, store = load_index(db_path, embedding_model)
+    return build_retriever(db, store, k)
+
+def load_live_index(folder_path=None, db_path='./chroma_db', embedding_model=None, llm=None, check_interval=5.0,
+                    facts=None):
+    """A LiveIndex that follows newly published snapshots, or a fixed one for unversioned indexes.
+
+    facts, if given, is served instead of each snapshot's own fund facts table.
+    """
+    folder_path = folder_path or os.getcwd()
+    embedding_model = instrument_embeddings(embedding_model or default_embedding_model())
+    llm = llm or default_llm()
+    # The only place a fresh index is built: as the first published snapshot
+    if not os.path.exists(db_path):
+        publish(db_path, build_snapshot(folder_path, db_path, embedding_model, text_splitter()))
+    if not is_snapshot_root(db_path):
+        retriever = load_unversioned_retriever(db_path, embedding_model)
+        if facts is None:
+            facts = FundFactsTable.from_folder(folder_path)
+        return LiveIndex.fixed(build_qa_chain(retriever, llm), index_version(db_path), facts)
+
+    def load_snapshot(version):
+        retriever = load_sharded_retriever(snapshot_path(db_path, version), embedding_model)
+        # The first search on a collection loads its vectors; do that before taking traffic
+        search_by_vectors(retriever, [embedding_model.embed_query("warm up")])
+        path = facts_path(db_path, version)
+        if facts is not None:
+            snapshot_facts = facts
+        elif os.path.exists(path):
+            snapshot_facts = FundFactsTable.load(path)
+        else:
+            # Snapshots built before facts.json existed fall back to the corpus on disk
+            snapshot_facts = FundFactsTable.from_folder(folder_path)
+        return build_qa_chain(retriever, llm), snapshot_facts
+
+    return LiveIndex(db_path, load_snapshot, check_interval)
+
+def retriever_embeddings(retriever):
+    if isinstance(retriever, ShardedRetriever):
+        return retriever.embeddings
+    return retriever.vectorstore.embeddings
+
+def search_by_vectors(retriever, vectors, questions=None):
+    """Top-k documents for each query vector from one batched vector search"""
+    if isinstance(retriever, ShardedRetriever):
+        return retriever.search_by_vectors(vectors, questions)
+    if isinstance(retriever, CompactRetriever):
+        return retriever.search_by_vectors(vectors)
+
+    k = retriever.search_kwargs.get("k", 4)
+    hits = retriever.vectorstore._collection.query(
+        query_embeddings=vectors, n_results=k, include=["documents", "metadatas"]
+    )
+    return [
+        [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+        for texts, metadatas in zip(hits["documents"], hits["metadatas"])
+    ]
+
+def answer_batch(qa_chain, questions, max_concurrency=4):
+    """Answer many questions with one embedding pass and one batched vector search.
+
+    Yields (index, response, error) as each answer completes, where response
+    has the same shape as qa_chain.invoke. Repeated questions are answered once.
+    """
+    unique = {}
+    for i, question in enumerate(questions):
+        unique.setdefault(normalize_question(question), []).append(i)
+    groups = list(unique.values())
+    batch_questions = [questions[indices[0]] for indices in groups]
+    if not batch_questions:
+        return
+
+    retriever = qa_chain.retriever
+    try:
+        vectors = retriever_embeddings(retriever).embed_documents(batch_questions)
+        docs_per_question = search_by_vectors(retriever, vectors, batch_questions)
+    except Exception as e:
+        # Without retrieval nothing can be answered; report it once per question
+        for indices in groups:
+            for i in indices:
+                yield i, None, e
+        return
+
+    def generate(j):
+        answer = qa_chain.combine_documents_chain.invoke(
+            {"input_documents": docs_per_question[j], "question": batch_questions[j]}
+        )
+        return {"query": batch_questions[j], "result": answer["output_text"], "source_documents": docs_per_question[j]}
+
+    executor = ThreadPoolExecutor(max_workers=max_concurrency)
+    try:
+        futures = {executor.submit(generate, j): j for j in range(len(batch_questions))}
+        for future in as_completed(futures):
+            error = future.exception()
+            response = None if error else future.result()
+            for i in groups[futures[future]]:
+                yield i, response, error
+    finally:
+        # Stop queued generations if the consumer goes away early
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def index_version(db_path='./chroma_db'):
+    """Identify the on-disk index build so results from different builds are never mixed"""
+    if not os.path.exists(db_path):
+        return None
+    if is_snapshot_root(db_path):
+        return current_version(db_path)
+    return str(os.stat(db_path).st_mtime_ns)
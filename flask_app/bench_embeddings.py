@@ -0,0 +1,135 @@
+"""Compare the PyTorch and ONNX embedding backends on the real corpus.
+
+Each backend runs in a fresh interpreter so import time and memory are
+its own. Reported per backend: import + model load time, peak RSS,
+embeddings/sec over corpus chunks, single-query latency, and the lowest
+cosine similarity to the PyTorch vectors for the same texts.
+
+    python onnx_embeddings.py export
+    python bench_embeddings.py --backends torch,onnx,onnx-int8 --output embeddings.json
+"""
+import argparse
+import json
+import os
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+QUERIES = [
+    "What is the expense ratio of ICICI Prudential Value Discovery Fund?",
+    "Which funds hold HDFC Bank in their top holdings?",
+    "What did Reliance Industries announce about its refinery?",
+    "How has the 3 year return of Axis Bluechip Fund compared with its benchmark?",
+    "Latest news on TCS quarterly results",
+]
+
+
+def _peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend, texts_path, vectors_path, threads, rounds):
+    """Runs inside the child interpreter and prints one JSON result line"""
+    import numpy as np
+
+    baseline_mb = _peak_rss_mb()
+    start = time.perf_counter()
+    if backend == 'torch':
+        from langchain_community.embeddings import HuggingFaceEmbeddings
+        model = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+    else:
+        from onnx_embeddings import OnnxEmbeddings
+        model = OnnxEmbeddings(quantized=backend == 'onnx-int8', threads=threads)
+    load_s = time.perf_counter() - start
+
+    with open(texts_path, 'r', encoding='utf-8') as f:
+        texts = json.load(f)
+    model.embed_documents(texts[:8])
+
+    start = time.perf_counter()
+    vectors = model.embed_documents(texts)
+    embed_s = time.perf_counter() - start
+    np.save(vectors_path, np.asarray(vectors, dtype=np.float32))
+
+    timings = []
+    for _ in range(rounds):
+        for query in QUERIES:
+            start = time.perf_counter()
+            model.embed_query(query)
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+
+    print(json.dumps({
+        "backend": backend,
+        "threads": getattr(model, 'threads', None),
+        "import_and_load_s": load_s,
+        "embeddings_per_s": len(texts) / embed_s,
+        "query_p50_ms": timings[len(timings) // 2] * 1000,
+        "query_p95_ms": timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000,
+        "query_mean_ms": statistics.fmean(timings) * 1000,
+        "peak_rss_mb": _peak_rss_mb(),
+        "rss_added_mb": _peak_rss_mb() - baseline_mb,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--backends', default='torch,onnx,onnx-int8')
+    parser.add_argument('--folder', default=os.getcwd())
+    parser.add_argument('--texts', type=int, default=512, help='Corpus chunks to embed')
+    parser.add_argument('--rounds', type=int, default=20, help='Passes over the sample queries')
+    parser.add_argument('--threads', type=int, help='Override the tuned intra-op thread count')
+    parser.add_argument('--output', help='Write results here instead of stdout')
+    parser.add_argument('--run', help=argparse.SUPPRESS)
+    parser.add_argument('--texts-path', help=argparse.SUPPRESS)
+    parser.add_argument('--vectors-path', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        run_backend(args.run, args.texts_path, args.vectors_path, args.threads, args.rounds)
+        return
+
+    import numpy as np
+    from backend import text_splitter
+    from docstore import CompactDocStore
+    from onnx_embeddings import min_cosine
+
+    workdir = tempfile.mkdtemp(prefix='bench_embeddings_')
+    texts_path = os.path.join(workdir, 'texts.json')
+    store = CompactDocStore.from_folder(args.folder, text_splitter())
+    with open(texts_path, 'w', encoding='utf-8') as f:
+        json.dump(store.texts(0, args.texts), f)
+
+    results, vectors = [], {}
+    for backend in args.backends.split(','):
+        print(f"Benchmarking {backend}...", file=sys.stderr)
+        vectors_path = os.path.join(workdir, f'{backend}.npy')
+        command = [sys.executable, os.path.abspath(__file__), '--run', backend,
+                   '--texts-path', texts_path, '--vectors-path', vectors_path, '--rounds', str(args.rounds)]
+        if args.threads:
+            command += ['--threads', str(args.threads)]
+        completed = subprocess.run(command, capture_output=True, text=True)
+        if completed.returncode != 0:
+            print(f"{backend} failed: {completed.stderr.strip().splitlines()[-1:]}", file=sys.stderr)
+            continue
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+        vectors[backend] = np.load(vectors_path)
+
+    if 'torch' in vectors:
+        for result in results:
+            result["min_cosine_vs_torch"] = min_cosine(vectors['torch'], vectors[result['backend']])
+
+    output = json.dumps({"texts": args.texts, "cpus": os.cpu_count(), "results": results}, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Saved results to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
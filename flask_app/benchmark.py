@@ -0,0 +1,343 @@
+"""Reproducible end-to-end benchmark for the RAG serving path.
+
+Generates synthetic corpora shaped like FINAL_MF.json / FINAL_STOCK.json,
+builds an index with the same code the app uses and reports ingest time,
+index size, query embedding latency, retrieval QPS and recall, full /ask
+latency, /ask_batch against sequential /ask calls, and routed and fan-out
+search over per-asset-class shards against the single collection, all
+against a deterministic stub LLM. Results are written as JSON so runs can be
+compared across commits.
+
+    python benchmark.py --sizes 1000,10000 --embeddings hash --output bench.json
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.language_models.llms import LLM
+from app import create_app
+from backend import (
+    load_documents, split_documents, default_embedding_model, build_qa_chain, build_retriever,
+    create_index, docstore_path, text_splitter
+)
+from docstore import CompactDocStore
+from shards import create_sharded_index, load_sharded_retriever
+
+SECTORS = ['Financial Services', 'Technology', 'Healthcare', 'Energy', 'Consumer Defensive',
+           'Industrials', 'Basic Materials', 'Utilities', 'Communication Services']
+HOLDINGS = ['HDFC Bank Ltd', 'Reliance Industries Ltd', 'ICICI Bank Ltd', 'Infosys Ltd',
+            'Axis Bank Ltd', 'Tata Consultancy Services Ltd', 'Bharti Airtel Ltd', 'ITC Ltd']
+RISK_LEVELS = ['low', 'moderate', 'moderately high', 'high', 'very high']
+AMCS = ['ICICI Prudential', 'HDFC', 'SBI', 'Axis', 'Kotak', 'Nippon India', 'Aditya Birla Sun Life']
+STYLES = ['Value Discovery', 'Bluechip', 'Flexi Cap', 'Small Cap', 'Midcap Opportunities', 'Focused Equity']
+NEWS_VERBS = ['reported', 'announced', 'posted', 'flagged', 'guided for', 'delivered']
+NEWS_TOPICS = ['quarterly profit', 'refinery maintenance', 'capacity expansion', 'dividend payout',
+               'debt reduction', 'margin pressure', 'order book growth', 'regulatory approval']
+
+
+class StubLLM(LLM):
+    """Deterministic local LLM so /ask latency excludes the remote round trip"""
+
+    latency: float = 0.0
+
+    @property
+    def _llm_type(self):
+        return "stub"
+
+    def _call(self, prompt, stop=None, run_manager=None, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        digest = hashlib.sha1(prompt.encode('utf-8')).hexdigest()[:12]
+        return f"Stub answer {digest} from {len(prompt.split())} prompt tokens."
+
+
+def _fund_text(rng, name):
+    return (
+        f"{name} has delivered a CAGR return of {rng.uniform(5, 25):.2f}% since inception in "
+        f"{rng.randint(1995, 2020)}. Recent returns include {rng.uniform(-5, 40):.2f}% over 1 year, "
+        f"{rng.uniform(0, 30):.2f}% over 3 years, and {rng.uniform(0, 35):.2f}% over 5 years. "
+        f"The fund is heavily invested in {rng.choice(SECTORS)} ({rng.uniform(10, 45):.1f}%). "
+        f"Top holdings include {', '.join(rng.sample(HOLDINGS, 3))}. It is categorized as a "
+        f"{rng.choice(RISK_LEVELS)} risk fund with an expense ratio of {rng.uniform(0.1, 2.5):.2f}%."
+    )
+
+
+def _stock_text(rng, name):
+    sentences = [
+        f"{name.lower()} {rng.choice(NEWS_VERBS)} {rng.choice(NEWS_TOPICS)} this week trade sources said ."
+        for _ in range(4)
+    ]
+    return " ".join(sentences)
+
+
+def generate_corpus(folder_path, n_chunks, seed=0):
+    """Write synthetic MF and stock JSON files totalling roughly n_chunks chunks"""
+    rng = random.Random(seed)
+    funds, stocks = [], []
+    n_funds = max(1, n_chunks // 2)
+    n_stock_items = max(1, (n_chunks - n_funds) // 4)
+
+    for i in range(n_funds):
+        name = f"{rng.choice(AMCS)} {rng.choice(STYLES)} Fund {i} Direct Plan Growth"
+        funds.append({"name": name, "ticker": f"INFSYN{i:06d}", "clean_data": [_fund_text(rng, name)]})
+
+    for i in range(n_stock_items):
+        name = f"Synthetic Industries {i} Ltd."
+        stocks.append({
+            "name": name,
+            "ticker": f"SYN{i}",
+            "publish_date": [f"2025-0{rng.randint(1, 9)}-{rng.randint(10, 28)}T10:00:00+00:00" for _ in range(4)],
+            "clean_data": [_stock_text(rng, name) for _ in range(4)],
+        })
+
+    with open(os.path.join(folder_path, 'SYNTH_MF.json'), 'w', encoding='utf-8') as f:
+        json.dump(funds, f)
+    with open(os.path.join(folder_path, 'SYNTH_STOCK.json'), 'w', encoding='utf-8') as f:
+        json.dump(stocks, f)
+
+    questions = [f"What is the expense ratio of {fund['name']}?" for fund in funds]
+    questions += [f"What did {stock['name']} announce recently?" for stock in stocks]
+    rng.shuffle(questions)
+    return questions
+
+
+def _dir_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for filename in files:
+            total += os.path.getsize(os.path.join(root, filename))
+    return total
+
+
+def _latency_summary(samples):
+    samples = sorted(samples)
+    return {
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) * 1000,
+        "p50_ms": samples[len(samples) // 2] * 1000,
+        "p95_ms": samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000,
+    }
+
+
+def _all_embeddings(db, batch_size=5000):
+    ids, vectors = [], []
+    total = db._collection.count()
+    for offset in range(0, total, batch_size):
+        page = db._collection.get(include=["embeddings"], limit=batch_size, offset=offset)
+        ids.extend(page["ids"])
+        vectors.append(np.asarray(page["embeddings"], dtype=np.float32))
+    return ids, np.vstack(vectors)
+
+
+def measure_recall(db, query_vectors, k):
+    """Recall@k of the vector store against exact L2 search over the same vectors"""
+    ids, matrix = _all_embeddings(db)
+    norms = (matrix * matrix).sum(axis=1)
+    recalls = []
+    for vector in query_vectors:
+        q = np.asarray(vector, dtype=np.float32)
+        distances = norms - 2 * matrix @ q
+        exact = {ids[i] for i in np.argpartition(distances, min(k, len(ids) - 1))[:k]}
+        found = set(db._collection.query(query_embeddings=[list(vector)], n_results=k)["ids"][0])
+        recalls.append(len(exact & found) / len(exact))
+    return statistics.fmean(recalls)
+
+
+def _traced(fn):
+    """Run fn, returning (result, seconds, bytes still allocated by it)"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, elapsed, allocated
+
+
+def measure_docstore(folder_path, db_path):
+    """Memory per chunk and load time of Document lists vs the compact docstore"""
+    docs, docs_s, docs_bytes = _traced(lambda: split_documents(load_documents(folder_path)))
+    count = len(docs)
+    del docs
+    store, build_s, store_bytes = _traced(lambda: CompactDocStore.from_folder(folder_path, text_splitter()))
+    del store
+    _, load_s, _ = _traced(lambda: CompactDocStore.load(docstore_path(db_path)))
+    return {
+        "documents_bytes_per_chunk": docs_bytes / count,
+        "documents_load_s": docs_s,
+        "compact_bytes_per_chunk": store_bytes / count,
+        "compact_build_s": build_s,
+        "compact_load_s": load_s,
+    }
+
+
+def _search_latency(search, vectors, questions, warmup=20):
+    # Each collection loads its index on first use, which would otherwise count against it
+    for vector, question in list(zip(vectors, questions))[:warmup]:
+        search(vector, question)
+    timings = []
+    start_all = time.perf_counter()
+    for vector, question in zip(vectors, questions):
+        start = time.perf_counter()
+        search(vector, question)
+        timings.append(time.perf_counter() - start)
+    summary = _latency_summary(timings)
+    summary["qps"] = len(vectors) / (time.perf_counter() - start_all)
+    return summary
+
+
+def measure_shards(workdir, retriever, embedding_model, vectors, questions, k):
+    """Search latency of the single collection vs routed and fan-out queries over shards"""
+    db_path = os.path.join(workdir, 'chroma_sharded')
+    start = time.perf_counter()
+    manifest = create_sharded_index(workdir, db_path, embedding_model, text_splitter())
+    ingest_s = time.perf_counter() - start
+    sharded = load_sharded_retriever(db_path, embedding_model, k)
+
+    routed = [len(sharded.router.route(question)) for question in questions]
+    return {
+        "ingest_s": ingest_s,
+        "shard_chunks": {name: shard["chunks"] for name, shard in manifest["shards"].items()},
+        "routed_to_one_shard": sum(1 for n in routed if n == 1) / len(routed),
+        "single": _search_latency(lambda v, q: retriever.search_by_vectors([v]), vectors, questions),
+        "routed": _search_latency(lambda v, q: sharded.search_by_vectors([v], [q]), vectors, questions),
+        "fan_out": _search_latency(lambda v, q: sharded.search_by_vectors([v]), vectors, questions),
+    }
+
+
+def run_scale(n_chunks, embedding_model, args):
+    workdir = tempfile.mkdtemp(prefix=f"rag_bench_{n_chunks}_")
+    try:
+        questions = generate_corpus(workdir, n_chunks, seed=args.seed)
+        db_path = os.path.join(workdir, 'chroma_db')
+        result = {"target_chunks": n_chunks}
+
+        start = time.perf_counter()
+        db, store = create_index(workdir, db_path, embedding_model)
+        result["ingest_s"] = time.perf_counter() - start
+        result["chunks"] = len(store)
+        result["ingest_chunks_per_s"] = len(store) / result["ingest_s"]
+        result["index_bytes"] = _dir_size(db_path)
+        result["index_bytes_per_chunk"] = result["index_bytes"] / len(store)
+        result["docstore"] = measure_docstore(workdir, db_path)
+        retriever = build_retriever(db, store, k=args.k)
+
+        sample = questions[:args.queries]
+        timings, vectors = [], []
+        for question in sample:
+            start = time.perf_counter()
+            vectors.append(embedding_model.embed_query(question))
+            timings.append(time.perf_counter() - start)
+        result["query_embedding"] = _latency_summary(timings)
+
+        timings = []
+        start_all = time.perf_counter()
+        for vector in vectors:
+            start = time.perf_counter()
+            retriever.search_by_vectors([vector])
+            timings.append(time.perf_counter() - start)
+        result["retrieval"] = _latency_summary(timings)
+        result["retrieval"]["qps"] = len(vectors) / (time.perf_counter() - start_all)
+        result[f"recall_at_{args.k}"] = measure_recall(db, vectors[:args.recall_queries], args.k)
+        result["shards"] = measure_shards(workdir, retriever, embedding_model, vectors, sample, args.k)
+
+        app = create_app(build_qa_chain(retriever, StubLLM(latency=args.llm_latency)), db_path, folder_path=workdir)
+        client = app.test_client()
+        timings, by_route = [], {}
+        for question in sample:
+            start = time.perf_counter()
+            resp = client.post("/ask", json={"question": question})
+            elapsed = time.perf_counter() - start
+            if resp.status_code != 200:
+                raise RuntimeError(f"/ask returned {resp.status_code} for {question!r}")
+            timings.append(elapsed)
+            by_route.setdefault(resp.json["route"], []).append(elapsed)
+        result["ask"] = _latency_summary(timings)
+        result["ask_by_route"] = {route: _latency_summary(samples) for route, samples in by_route.items()}
+        result["fast_path_share"] = len(by_route.get("facts", [])) / len(timings)
+
+        batch = questions[:args.batch_size]
+        start = time.perf_counter()
+        for question in batch:
+            client.post("/ask", json={"question": question})
+        sequential_s = time.perf_counter() - start
+        start = time.perf_counter()
+        resp = client.post("/ask_batch", json={"questions": batch})
+        answered = len(resp.get_data(as_text=True).splitlines())
+        batch_s = time.perf_counter() - start
+        if answered != len(batch):
+            raise RuntimeError(f"/ask_batch answered {answered} of {len(batch)} questions")
+        result["batch"] = {
+            "questions": len(batch),
+            "sequential_ask_s": sequential_s,
+            "ask_batch_s": batch_s,
+            "speedup": sequential_s / batch_s,
+        }
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000',
+                        help='Comma-separated chunk counts, e.g. 1000,10000,100000,1000000')
+    parser.add_argument('--embeddings', choices=['minilm', 'hash'], default='minilm',
+                        help='hash uses deterministic fake vectors so large scales finish quickly')
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--recall-queries', type=int, default=50)
+    parser.add_argument('--batch-size', type=int, default=50,
+                        help='Questions sent to /ask_batch and, for comparison, one by one to /ask')
+    parser.add_argument('-k', type=int, default=4)
+    parser.add_argument('--llm-latency', type=float, default=0.0,
+                        help='Seconds the stub LLM sleeps per call')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write results here instead of stdout')
+    args = parser.parse_args()
+
+    if args.embeddings == 'hash':
+        embedding_model = DeterministicFakeEmbedding(size=384)
+    else:
+        embedding_model = default_embedding_model()
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": time.strftime('%Y-%m-%dT%H:%M:%S'),
+        "params": vars(args),
+        "results": [],
+    }
+    for size in [int(s) for s in args.sizes.split(',')]:
+        print(f"Benchmarking {size} chunks...", file=sys.stderr)
+        report["results"].append(run_scale(size, embedding_model, args))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output)
+        print(f"Saved results to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
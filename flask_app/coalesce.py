@@ -0,0 +1,89 @@
+import re
+import threading
+
+
+def normalize_question(question):
+    """Canonical form used to decide whether two questions are the same"""
+    return re.sub(r'\s+', ' ', question).strip().casefold()
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.cancelled = False
+
+
+class SingleFlight:
+    """Runs at most one computation per key at a time and shares its outcome
+    with every caller that asks for the same key while it is in flight."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self._stats = {
+            'leaders': 0,      # calls that actually ran the computation
+            'coalesced': 0,    # calls served by someone else's computation
+            'errors': 0,       # computations that raised
+            'cancelled': 0,    # computations abandoned by their leader
+            'timeouts': 0,     # waiters that gave up before the result arrived
+        }
+
+    def do(self, key, fn, timeout=None):
+        """Return fn() for this key, sharing a computation already in flight"""
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                leader = call is None
+                if leader:
+                    call = _Call()
+                    self._calls[key] = call
+                    self._stats['leaders'] += 1
+
+            if leader:
+                return self._run(key, call, fn)
+
+            if not call.done.wait(timeout):
+                # Giving up only affects this caller; the leader keeps going
+                with self._lock:
+                    self._stats['timeouts'] += 1
+                raise TimeoutError(f"Timed out waiting for in-flight request {key!r}")
+
+            if call.cancelled:
+                # The leader was interrupted rather than failing, so its
+                # cancellation is not ours to raise. Elect a new leader.
+                continue
+
+            with self._lock:
+                self._stats['coalesced'] += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn()
+            return call.result
+        except Exception as e:
+            call.error = e
+            with self._lock:
+                self._stats['errors'] += 1
+            raise
+        except BaseException:
+            call.cancelled = True
+            with self._lock:
+                self._stats['cancelled'] += 1
+            raise
+        finally:
+            # Unregister before waking waiters so late arrivals start fresh
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+
+    def stats(self):
+        """Snapshot of the counters plus the number of computations in flight"""
+        with self._lock:
+            snapshot = dict(self._stats)
+            snapshot['in_flight'] = len(self._calls)
+        return snapshot
@@ -0,0 +1,191 @@
+import os
+import json
+import mmap
+import shutil
+import sys
+from array import array
+from typing import Any
+
+from langchain.schema import Document
+from langchain_core.retrievers import BaseRetriever
+
+METADATA_COLUMNS = ("name", "ticker", "source_file")
+
+# Vectors are added to Chroma in batches below its per-call limit
+INGEST_BATCH_SIZE = 4096
+
+
+def corpus_items(folder_path):
+    """Yield (filename, item) for every entry in the folder's JSON files"""
+    for filename in os.listdir(folder_path):
+        if not filename.endswith('.json'):
+            continue
+        with open(os.path.join(folder_path, filename), 'r', encoding='utf-8') as f:
+            try:
+                data = json.load(f)
+            except json.JSONDecodeError:
+                print(f"Skipping bad JSON: {filename}", file=sys.stderr)
+                continue
+        for item in data if isinstance(data, list) else []:
+            yield filename, item
+
+
+class CompactDocStore:
+    """Chunk texts and metadata packed into arrays instead of one Document per chunk.
+
+    Text lives in a single UTF-8 buffer addressed by an offsets array, and each
+    metadata column is interned into a value list plus one integer code per
+    chunk. Documents are only built for the rows a caller asks for.
+    """
+
+    def __init__(self, columns=METADATA_COLUMNS):
+        self.columns = tuple(columns)
+        self._values = {column: [] for column in self.columns}
+        self._codes = {column: {} for column in self.columns}
+        self._column_data = {column: array('I') for column in self.columns}
+        self._buffer = bytearray()
+        self._offsets = array('Q', [0])
+        self._mmap = None
+
+    @classmethod
+    def from_folder(cls, folder_path, text_splitter):
+        """Chunk every clean_data entry in the folder's JSON files, like load_documents + split_documents"""
+        return cls.from_items(corpus_items(folder_path), text_splitter)
+
+    @classmethod
+    def from_items(cls, items, text_splitter):
+        """Chunk (filename, item) pairs as produced by corpus_items"""
+        store = cls()
+        for filename, item in items:
+            metadata = {
+                "name": item.get("name", "Unknown"),
+                "ticker": item.get("ticker", "Unknown"),
+                "source_file": filename
+            }
+            for text in item.get("clean_data", []):
+                if text:
+                    for chunk in text_splitter.split_text(text):
+                        store.add(chunk, metadata)
+        return store
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def add(self, text, metadata):
+        if self._mmap is not None:
+            raise ValueError("A loaded docstore is read-only")
+        for column in self.columns:
+            value = metadata.get(column, "Unknown")
+            code = self._codes[column].get(value)
+            if code is None:
+                code = len(self._values[column])
+                self._values[column].append(value)
+                self._codes[column][value] = code
+            self._column_data[column].append(code)
+        self._buffer += text.encode('utf-8')
+        self._offsets.append(len(self._buffer))
+        return len(self) - 1
+
+    def text(self, i):
+        buffer = self._mmap if self._mmap is not None else self._buffer
+        return buffer[self._offsets[i]:self._offsets[i + 1]].decode('utf-8')
+
+    def metadata(self, i):
+        return {column: self._values[column][self._column_data[column][i]] for column in self.columns}
+
+    def document(self, i):
+        return Document(page_content=self.text(i), metadata=self.metadata(i))
+
+    def texts(self, start=0, stop=None):
+        stop = len(self) if stop is None else min(stop, len(self))
+        return [self.text(i) for i in range(start, stop)]
+
+    def nbytes(self):
+        """Bytes held by the packed arrays, excluding the interned value lists"""
+        text_bytes = len(self._mmap) if self._mmap is not None else len(self._buffer)
+        code_bytes = sum(len(data) * data.itemsize for data in self._column_data.values())
+        return text_bytes + len(self._offsets) * self._offsets.itemsize + code_bytes
+
+    def save(self, path):
+        """Write the store to a directory, replacing any previous copy"""
+        tmp_path = f"{path}.tmp"
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        os.makedirs(tmp_path)
+
+        buffer = self._mmap if self._mmap is not None else self._buffer
+        with open(os.path.join(tmp_path, 'texts.bin'), 'wb') as f:
+            f.write(buffer)
+        with open(os.path.join(tmp_path, 'offsets.bin'), 'wb') as f:
+            self._offsets.tofile(f)
+        for column in self.columns:
+            with open(os.path.join(tmp_path, f'{column}.codes'), 'wb') as f:
+                self._column_data[column].tofile(f)
+        with open(os.path.join(tmp_path, 'columns.json'), 'w', encoding='utf-8') as f:
+            json.dump({"count": len(self), "values": self._values}, f, ensure_ascii=False)
+
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        """Open a saved store; the text buffer is memory-mapped rather than read"""
+        with open(os.path.join(path, 'columns.json'), 'r', encoding='utf-8') as f:
+            header = json.load(f)
+        store = cls(columns=header["values"].keys())
+        store._values = header["values"]
+        store._codes = {column: None for column in store.columns}
+
+        count = header["count"]
+        with open(os.path.join(path, 'offsets.bin'), 'rb') as f:
+            store._offsets = array('Q')
+            store._offsets.fromfile(f, count + 1)
+        for column in store.columns:
+            with open(os.path.join(path, f'{column}.codes'), 'rb') as f:
+                store._column_data[column] = array('I')
+                store._column_data[column].fromfile(f, count)
+
+        with open(os.path.join(path, 'texts.bin'), 'rb') as f:
+            if store._offsets[-1]:
+                store._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                store._mmap = b''
+        return store
+
+
+def index_vectors(db, store, embedding_model, batch_size=INGEST_BATCH_SIZE):
+    """Embed every chunk in the store and add the vectors to Chroma, keyed by row number"""
+    for start in range(0, len(store), batch_size):
+        texts = store.texts(start, start + batch_size)
+        db._collection.add(
+            ids=[str(row) for row in range(start, start + len(texts))],
+            embeddings=embedding_model.embed_documents(texts)
+        )
+
+
+class CompactRetriever(BaseRetriever):
+    """Chroma holds only vectors keyed by row number; documents come from the docstore"""
+
+    vectorstore: Any
+    store: Any
+    search_kwargs: dict = {"k": 4}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        vector = self.vectorstore.embeddings.embed_query(query)
+        return self.search_by_vectors([vector])[0]
+
+    def search_by_vectors(self, vectors):
+        """Top-k documents for each vector, from one batched vector search"""
+        return [
+            [self.store.document(row) for _, row in pairs]
+            for pairs in self.search_with_scores(vectors)
+        ]
+
+    def search_with_scores(self, vectors):
+        """Top-k (distance, row) pairs for each vector, without building documents"""
+        hits = self.vectorstore._collection.query(
+            query_embeddings=vectors, n_results=self.search_kwargs.get("k", 4), include=["distances"]
+        )
+        return [
+            [(distance, int(row)) for distance, row in zip(distances, ids)]
+            for distances, ids in zip(hits["distances"], hits["ids"])
+        ]
@@ -0,0 +1,269 @@
+import os
+import re
+import json
+import threading
+
+# ISINs are how FINAL_MF.json identifies funds; stock tickers never match this
+ISIN_RE = re.compile(r'\bIN[A-Z0-9]{9}\d\b')
+
+NUMBER = r'(-?\d+(?:\.\d+)?)'
+HORIZONS = {'1': 'return_1y', 'one': 'return_1y', 'past year': 'return_1y', 'last year': 'return_1y',
+            '3': 'return_3y', 'three': 'return_3y', '5': 'return_5y', 'five': 'return_5y'}
+
+EXPENSE_RATIO_RE = re.compile(r'expense ratio of ' + NUMBER + '%', re.I)
+RISK_RE = re.compile(r'\b(very low|low to moderate|moderately high|very high|low|moderate|high)[- ]risk\b', re.I)
+RETURN_RE = re.compile(NUMBER + r'% over (?:the )?(1|one|3|three|5|five|past year|last year)(?:[- ]years?)?\b', re.I)
+HOLDINGS_RE = re.compile(r'Top holdings include (.+?)\.(?:\s|$)', re.I)
+
+# Words in fund names that do not help tell funds apart
+GENERIC_NAME_TOKENS = {'fund', 'direct', 'plan', 'growth', 'the', 'of', 'and', 'option'}
+
+# Questions asking for judgement rather than a figure go to the RAG chain
+OPEN_ENDED_RE = re.compile(
+    r'\b(why|how come|should|compar\w*|versus|vs|against|relative to|differ\w*|than|better|best|worse|'
+    r'recommend|explain|outlook|predict|forecast|future|expect|historical|history|trend)\b', re.I
+)
+# The table holds one current figure per fund, for the plan its name says
+YEAR_RE = re.compile(r'\b(?:19|20)\d\d\b')
+PLAN_VARIANT_RE = re.compile(r'\b(regular|direct|idcw|dividend|payout|reinvest\w*|bonus|growth)\b', re.I)
+FIELD_PATTERNS = [
+    ('expense_ratio', re.compile(r'expense ratio|\bter\b|\bfees?\b|\bcharges?\b', re.I)),
+    ('risk_level', re.compile(r'\brisk(?:y|iness| level| profile)?\b', re.I)),
+    ('top_holdings', re.compile(r'\bholdings?\b|\btop stocks\b', re.I)),
+]
+RETURNS_QUESTION_RE = re.compile(r'\breturns?\b|\bperform(?:ance|ed)?\b|\bcagr\b', re.I)
+RETURN_HORIZON_RE = re.compile(r'\b(1|one|3|three|5|five)[- ]?(?:years?|yrs?)\b', re.I)
+RETURN_FIELDS = ['return_1y', 'return_3y', 'return_5y']
+HORIZON_LABELS = {'return_1y': '1 year', 'return_3y': '3 years', 'return_5y': '5 years'}
+
+
+def _tokens(text):
+    return set(re.findall(r'[a-z0-9]+', text.lower()))
+
+
+def _sentence_around(text, start, end):
+    """The sentence containing text[start:end], used as the citation snippet"""
+    left = max(text.rfind('. ', 0, start), text.rfind('\n', 0, start))
+    right = text.find('. ', end)
+    return text[left + 2 if left >= 0 else 0:right + 1 if right >= 0 else len(text)].strip()
+
+
+def _split_holdings(raw):
+    parts = re.split(r',\s*(?:and\s+)?|\s+and\s+', raw)
+    return [part.strip() for part in parts if part.strip()]
+
+
+def extract_facts(text):
+    """Pull {field: (value, snippet)} out of one clean_data chunk"""
+    facts = {}
+
+    match = EXPENSE_RATIO_RE.search(text)
+    if match:
+        facts['expense_ratio'] = (float(match.group(1)), _sentence_around(text, *match.span()))
+
+    match = RISK_RE.search(text)
+    if match:
+        facts['risk_level'] = (match.group(1).lower(), _sentence_around(text, *match.span()))
+
+    for match in RETURN_RE.finditer(text):
+        field = HORIZONS[match.group(2).lower()]
+        facts.setdefault(field, (float(match.group(1)), _sentence_around(text, *match.span())))
+
+    match = HOLDINGS_RE.search(text)
+    if match:
+        facts['top_holdings'] = (_split_holdings(match.group(1)), _sentence_around(text, match.start(), match.end(1)))
+
+    return facts
+
+
+class FundFactsTable:
+    """Facts parsed from mutual fund clean_data, indexed by ISIN and by fund name tokens"""
+
+    def __init__(self):
+        self.funds = {}
+        self._by_name = {}
+        self._token_index = {}
+
+    @classmethod
+    def from_folder(cls, folder_path):
+        table = cls()
+        for filename in sorted(os.listdir(folder_path)):
+            if not filename.endswith('.json'):
+                continue
+            with open(os.path.join(folder_path, filename), 'r', encoding='utf-8') as f:
+                try:
+                    data = json.load(f)
+                except json.JSONDecodeError:
+                    continue
+            for item in data if isinstance(data, list) else []:
+                table.add(item, filename)
+        return table
+
+    @classmethod
+    def load(cls, path):
+        table = cls()
+        with open(path, 'r', encoding='utf-8') as f:
+            for fund in json.load(f):
+                table._index(fund)
+        return table
+
+    def save(self, path):
+        with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+            json.dump(list(self.funds.values()), f)
+        os.replace(f"{path}.tmp", path)
+
+    def add(self, item, source_file):
+        isin = item.get("ticker", "")
+        if not ISIN_RE.fullmatch(isin):
+            return
+        name = item.get("name", "Unknown")
+
+        facts = {}
+        for text in item.get("clean_data", []):
+            for field, (value, snippet) in extract_facts(text or "").items():
+                # The first chunk that states a fact wins
+                facts.setdefault(field, {'value': value, 'snippet': snippet})
+        if not facts:
+            return
+
+        self._index({
+            'isin': isin,
+            'name': name,
+            'source_file': source_file,
+            'facts': facts
+        })
+
+    def _index(self, fund):
+        isin = fund['isin']
+        self.funds[isin] = fund
+        self._by_name[fund['name'].lower()] = isin
+        for token in _tokens(fund['name']) - GENERIC_NAME_TOKENS:
+            self._token_index.setdefault(token, set()).add(isin)
+
+    def __len__(self):
+        return len(self.funds)
+
+    def get(self, isin_or_name):
+        isin = isin_or_name if isin_or_name in self.funds else self._by_name.get(isin_or_name.lower())
+        return self.funds.get(isin)
+
+    def find_fund(self, question):
+        """The single fund a question names, or None if it names none or is ambiguous"""
+        match = ISIN_RE.search(question.upper())
+        if match and match.group(0) in self.funds:
+            return self.funds[match.group(0)]
+
+        question_tokens = _tokens(question)
+        candidates = {}
+        for token in question_tokens:
+            for isin in self._token_index.get(token, ()):
+                candidates[isin] = candidates.get(isin, 0) + 1
+
+        # A fund matches only if every distinctive word of its name appears
+        matches = {
+            isin: _tokens(self.funds[isin]['name']) - GENERIC_NAME_TOKENS
+            for isin, hits in candidates.items()
+            if hits == len(_tokens(self.funds[isin]['name']) - GENERIC_NAME_TOKENS)
+        }
+        if not matches:
+            return None
+        best = max(matches, key=lambda isin: len(matches[isin]))
+        # A shorter name contained in the best one is not a second fund ("Liquid" in "Liquid Plus");
+        # any other full match means the question names several funds
+        if any(not tokens <= matches[best] for tokens in matches.values()):
+            return None
+        return self.funds[best]
+
+
+def requested_fields(question):
+    """Fact fields a question asks for, or [] if it is not a plain lookup"""
+    if OPEN_ENDED_RE.search(question):
+        return []
+
+    fields = [field for field, pattern in FIELD_PATTERNS if pattern.search(question)]
+    if RETURNS_QUESTION_RE.search(question):
+        horizons = [HORIZONS[m.group(1).lower()] for m in RETURN_HORIZON_RE.finditer(question)]
+        # 'returns' without a horizon means whichever horizons the fund reports
+        fields.extend(dict.fromkeys(horizons) if horizons else ['returns'])
+    return fields
+
+
+def _format_answer(fund, fields):
+    name = fund['name']
+    facts = fund['facts']
+    sentences = []
+    if 'expense_ratio' in fields:
+        sentences.append(f"The expense ratio of {name} is {facts['expense_ratio']['value']}%.")
+    if 'risk_level' in fields:
+        sentences.append(f"{name} is categorized as a {facts['risk_level']['value']} risk fund.")
+    returns = [f for f in RETURN_FIELDS if f in fields and f in facts]
+    if returns:
+        parts = [f"{facts[f]['value']}% over {HORIZON_LABELS[f]}" for f in returns]
+        sentences.append(f"{name} has returned {', '.join(parts)}.")
+    if 'top_holdings' in fields:
+        sentences.append(f"Top holdings of {name} include {', '.join(facts['top_holdings']['value'])}.")
+    return " ".join(sentences)
+
+
+class FactRouter:
+    """Answers plain fact lookups from the table and leaves everything else to RAG"""
+
+    def __init__(self, table=None):
+        self.table = table
+        self._lock = threading.Lock()
+        self._counts = {'facts': 0, 'rag': 0}
+
+    def answer(self, question, table=None):
+        """An /ask-shaped response dict for fact lookups, or None to use the RAG chain.
+
+        table overrides the router's own, so a request can use the one of the snapshot it is on.
+        """
+        table = table if table is not None else self.table
+        fields = requested_fields(question)
+        fund = table.find_fund(question) if fields and table is not None else None
+        if fund is None:
+            return None
+        # A year or plan the fund's own name does not state asks for a figure the table does not hold
+        name = fund['name'].lower()
+        if any(year not in name for year in YEAR_RE.findall(question)):
+            return None
+        if any(variant.lower() not in name for variant in PLAN_VARIANT_RE.findall(question)):
+            return None
+
+        facts = fund['facts']
+        if 'returns' in fields:
+            available = [f for f in RETURN_FIELDS if f in facts]
+            if not available:
+                return None
+            fields = [f for f in fields if f != 'returns'] + available
+        # Anything the table cannot answer in full goes to the RAG chain
+        if not all(f in facts for f in fields):
+            return None
+
+        cited = []
+        for field in fields:
+            if facts[field]['snippet'] not in cited:
+                cited.append(facts[field]['snippet'])
+
+        return {
+            "answer": _format_answer(fund, fields),
+            "sources": [
+                {
+                    "metadata": {"name": fund['name'], "ticker": fund['isin'], "source_file": fund['source_file']},
+                    "content_snippet": snippet
+                } for snippet in cited
+            ]
+        }
+
+    def record(self, route):
+        with self._lock:
+            self._counts[route] += 1
+
+    def stats(self):
+        with self._lock:
+            total = sum(self._counts.values())
+            return {
+                'facts': self._counts['facts'],
+                'rag': self._counts['rag'],
+                'fast_path_share': self._counts['facts'] / total if total else 0.0
+            }
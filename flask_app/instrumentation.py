@@ -0,0 +1,206 @@
+import os
+import re
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+
+try:
+    from prometheus_client import Counter, Gauge, Histogram, generate_latest, CONTENT_TYPE_LATEST
+except ImportError:
+    Counter = Gauge = Histogram = generate_latest = CONTENT_TYPE_LATEST = None
+
+# Set RAG_METRICS=0 to turn everything here into no-ops
+ENABLED = Histogram is not None and os.environ.get("RAG_METRICS", "1") != "0"
+
+_current_trace = ContextVar("rag_trace", default=None)
+_exported_gauges = {}
+_TRACE_ID_RE = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+if ENABLED:
+    STAGE_LATENCY = Histogram(
+        "rag_stage_latency_seconds",
+        "Time spent in each stage of the /ask serving path",
+        ["stage"],
+        buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30),
+    )
+    TOKENS = Counter(
+        "rag_tokens_total",
+        "Whitespace-delimited tokens sent to and received from the LLM",
+        ["direction"],
+    )
+    RETRIEVED_K = Histogram(
+        "rag_retrieved_documents",
+        "Documents returned by the retriever per question",
+        buckets=(0, 1, 2, 4, 8, 16, 32),
+    )
+    ERRORS = Counter(
+        "rag_errors_total",
+        "Errors raised inside each stage of the /ask serving path",
+        ["stage"],
+    )
+    ROUTE_LATENCY = Histogram(
+        "rag_route_latency_seconds",
+        "End-to-end answer latency by path: facts table, RAG chain, or rag_batch for a RAG answer "
+        "within /ask_batch measured from the start of the batch",
+        ["route"],
+        buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30),
+    )
+
+
+def _count_tokens(text):
+    # HuggingFaceHub does not report usage, so this is an approximation
+    return len(text.split())
+
+
+class Trace:
+    """Collects stage timings for one request and feeds them to Prometheus"""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.stages = {}
+
+    def observe(self, stage, seconds):
+        self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+        STAGE_LATENCY.labels(stage).observe(seconds)
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            ERRORS.labels(name).inc()
+            raise
+        finally:
+            self.observe(name, time.perf_counter() - start)
+
+    def invoke(self, chain, question):
+        """Run the chain with stage callbacks attached and this trace active"""
+        token = _current_trace.set(self)
+        try:
+            with self.stage("chain"):
+                return chain.invoke(question, config={"callbacks": [StageCallbackHandler(self)]})
+        finally:
+            _current_trace.reset(token)
+
+
+class _NullTrace:
+    """Stand-in used when instrumentation is disabled"""
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id
+        self.stages = {}
+
+    def observe(self, stage, seconds):
+        pass
+
+    def stage(self, name):
+        return nullcontext()
+
+    def invoke(self, chain, question):
+        return chain.invoke(question)
+
+
+def start_trace(trace_id=None):
+    """Begin a trace, reusing a caller-supplied ID when it looks sane"""
+    if trace_id and not _TRACE_ID_RE.match(trace_id):
+        trace_id = None
+    if not ENABLED:
+        return _NullTrace(trace_id)
+    return Trace(trace_id)
+
+
+class StageCallbackHandler(BaseCallbackHandler):
+    """Splits a RetrievalQA run into search, prompt assembly and LLM stages"""
+
+    def __init__(self, trace):
+        self.trace = trace
+        self._retriever_start = None
+        self._retriever_end = None
+        self._embed_before = 0.0
+        self._llm_start = None
+
+    def on_retriever_start(self, serialized, query, **kwargs):
+        self._retriever_start = time.perf_counter()
+        self._embed_before = self.trace.stages.get("embed", 0.0)
+
+    def on_retriever_end(self, documents, **kwargs):
+        now = time.perf_counter()
+        # The question embedding happens inside the retriever; report it separately
+        embed = self.trace.stages.get("embed", 0.0) - self._embed_before
+        self.trace.observe("search", now - self._retriever_start - embed)
+        RETRIEVED_K.observe(len(documents))
+        self._retriever_end = now
+
+    def on_retriever_error(self, error, **kwargs):
+        ERRORS.labels("search").inc()
+
+    def on_llm_start(self, serialized, prompts, **kwargs):
+        now = time.perf_counter()
+        if self._retriever_end is not None:
+            self.trace.observe("prompt", now - self._retriever_end)
+        self._llm_start = now
+        TOKENS.labels("prompt").inc(sum(_count_tokens(p) for p in prompts))
+
+    def on_llm_end(self, response, **kwargs):
+        self.trace.observe("llm", time.perf_counter() - self._llm_start)
+        completion = sum(
+            _count_tokens(gen.text) for gens in response.generations for gen in gens
+        )
+        TOKENS.labels("completion").inc(completion)
+
+    def on_llm_error(self, error, **kwargs):
+        ERRORS.labels("llm").inc()
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """Times question embeddings for whichever trace is active"""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def embed_documents(self, texts):
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text):
+        trace = _current_trace.get()
+        if trace is None:
+            return self.inner.embed_query(text)
+        with trace.stage("embed"):
+            return self.inner.embed_query(text)
+
+
+def instrument_embeddings(embedding_model):
+    if not ENABLED:
+        return embedding_model
+    return InstrumentedEmbeddings(embedding_model)
+
+
+def observe_route(route, seconds):
+    """Record which path answered a question and how long it took"""
+    if ENABLED:
+        ROUTE_LATENCY.labels(route).observe(seconds)
+
+
+def export_stats(prefix, stats_fn, description):
+    """Publish each key of a stats() dict as a gauge read at scrape time"""
+    if not ENABLED:
+        return
+    for key in stats_fn():
+        name = f"{prefix}_{key}"
+        # Re-exporting (e.g. a second create_app) repoints the existing gauge
+        if name not in _exported_gauges:
+            _exported_gauges[name] = Gauge(name, f"{description}: {key}")
+        gauge = _exported_gauges[name]
+        gauge.set_function(lambda key=key: stats_fn()[key])
+
+
+def render_metrics():
+    """Return (body, content_type) for the /metrics endpoint, or None when disabled"""
+    if not ENABLED:
+        return None
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -0,0 +1,226 @@
+"""MiniLM embeddings served by ONNX Runtime instead of PyTorch.
+
+The model is exported once, out of band, with torch and transformers:
+
+    python onnx_embeddings.py export            # fp32 + int8 models, verified and tuned
+    python onnx_embeddings.py export --no-quantize
+
+Export also embeds a sample of the corpus with the PyTorch model and both
+ONNX variants, and records the lowest cosine similarity for each. A
+variant below COSINE_TOLERANCE is refused at load time, so its vectors
+always stay interchangeable with an index built by HuggingFaceEmbeddings.
+The intra-op thread count with the best throughput is recorded as well.
+Serving only imports onnxruntime, tokenizers and numpy.
+"""
+import os
+import json
+import time
+import argparse
+
+import numpy as np
+import onnxruntime as ort
+from tokenizers import Tokenizer
+from langchain_core.embeddings import Embeddings
+
+MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'onnx_minilm')
+MODEL_FILES = {'fp32': 'model.onnx', 'int8': 'model.int8.onnx'}
+CONFIG_FILE = 'onnx_config.json'
+
+# all-MiniLM-L6-v2 truncates inputs at 256 word pieces
+MAX_SEQ_LENGTH = 256
+
+# Lowest acceptable cosine similarity to the PyTorch vector for the same text
+COSINE_TOLERANCE = {'fp32': 0.999, 'int8': 0.98}
+
+
+def load_config(model_dir):
+    path = os.path.join(model_dir, CONFIG_FILE)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_config(model_dir, config):
+    path = os.path.join(model_dir, CONFIG_FILE)
+    with open(f"{path}.tmp", 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=2)
+    os.replace(f"{path}.tmp", path)
+
+
+class OnnxEmbeddings(Embeddings):
+    """Drop-in replacement for HuggingFaceEmbeddings(model_name=MODEL_NAME)"""
+
+    def __init__(self, model_dir=DEFAULT_MODEL_DIR, quantized=False, threads=None, batch_size=32,
+                 verified_only=True):
+        self.variant = 'int8' if quantized else 'fp32'
+        self.batch_size = batch_size
+        config = load_config(model_dir)
+
+        min_cosine = config.get('min_cosine', {}).get(self.variant)
+        if verified_only and (min_cosine is None or min_cosine < COSINE_TOLERANCE[self.variant]):
+            raise ValueError(
+                f"The {self.variant} ONNX model in {model_dir} has not passed the cosine check "
+                f"(min {min_cosine}, need {COSINE_TOLERANCE[self.variant]}); run onnx_embeddings.py export"
+            )
+
+        if threads is None:
+            threads = int(os.environ.get("RAG_ONNX_THREADS", 0)) or config.get('threads', {}).get(self.variant)
+        self.threads = threads or min(4, os.cpu_count() or 1)
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            os.path.join(model_dir, MODEL_FILES[self.variant]), options, providers=['CPUExecutionProvider']
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(os.path.join(model_dir, 'tokenizer.json'))
+        self.tokenizer.enable_truncation(MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id('[PAD]') or 0, pad_token='[PAD]')
+
+    def _embed_batch(self, texts):
+        encodings = self.tokenizer.encode_batch(texts)
+        feed = {
+            'input_ids': np.array([e.ids for e in encodings], dtype=np.int64),
+            'attention_mask': np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            'token_type_ids': np.array([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        hidden = self.session.run(None, {name: feed[name] for name in self.input_names})[0]
+
+        # Mean pooling over real tokens, then unit length, as the sentence-transformers pipeline does
+        mask = feed['attention_mask'][:, :, None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        return pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        # Batching texts of similar length keeps padding, and wasted compute, small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = [None] * len(texts)
+        for start in range(0, len(order), self.batch_size):
+            rows = order[start:start + self.batch_size]
+            for i, vector in zip(rows, self._embed_batch([texts[i] for i in rows])):
+                vectors[i] = vector.tolist()
+        return vectors
+
+    def embed_query(self, text):
+        return self._embed_batch([text])[0].tolist()
+
+
+def export(model_dir=DEFAULT_MODEL_DIR, model_name=MODEL_NAME, quantize=True):
+    """Write model.onnx (and model.int8.onnx) plus tokenizer.json to model_dir"""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(model_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(model_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+
+    class Encoder(torch.nn.Module):
+        # Pins the traced inputs; BertModel.forward's positional order differs between transformers releases
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            return self.model(
+                input_ids=input_ids, attention_mask=attention_mask, token_type_ids=token_type_ids
+            ).last_hidden_state
+
+    names = ['input_ids', 'attention_mask', 'token_type_ids']
+    sample = tokenizer(["An example sentence to trace the graph."], return_tensors='pt')
+    dynamic_axes = {name: {0: 'batch', 1: 'sequence'} for name in names + ['last_hidden_state']}
+    fp32_path = os.path.join(model_dir, MODEL_FILES['fp32'])
+    with torch.no_grad():
+        torch.onnx.export(
+            Encoder().eval(), tuple(sample[name] for name in names), fp32_path,
+            input_names=names, output_names=['last_hidden_state'],
+            dynamic_axes=dynamic_axes, opset_version=14, do_constant_folding=True,
+            # The dynamo exporter, the default since torch 2.9, needs onnxscript and ignores dynamic_axes
+            dynamo=False
+        )
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        quantize_dynamic(fp32_path, os.path.join(model_dir, MODEL_FILES['int8']), weight_type=QuantType.QInt8)
+
+
+def min_cosine(reference, candidate):
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosines = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return float(cosines.min())
+
+
+def verify(model_dir, texts, variants):
+    """Lowest cosine similarity of each variant's vectors to the PyTorch model's"""
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+
+    reference = HuggingFaceEmbeddings(model_name=MODEL_NAME).embed_documents(texts)
+    return {
+        variant: min_cosine(
+            reference,
+            OnnxEmbeddings(model_dir, quantized=variant == 'int8', verified_only=False).embed_documents(texts)
+        ) for variant in variants
+    }
+
+
+def tune_threads(model_dir, texts, variant, candidates=None):
+    """Intra-op thread count with the highest embeddings/sec on the sample"""
+    cpus = os.cpu_count() or 1
+    candidates = candidates or sorted({n for n in (1, 2, 4, 8, cpus) if n <= cpus})
+    throughput = {}
+    for threads in candidates:
+        model = OnnxEmbeddings(model_dir, quantized=variant == 'int8', threads=threads, verified_only=False)
+        model.embed_documents(texts[:8])
+        start = time.perf_counter()
+        model.embed_documents(texts)
+        throughput[threads] = len(texts) / (time.perf_counter() - start)
+    return max(throughput, key=throughput.get), throughput
+
+
+def main():
+    from backend import text_splitter
+    from docstore import CompactDocStore
+
+    parser = argparse.ArgumentParser(description="Export, verify and tune the ONNX MiniLM model")
+    parser.add_argument('command', choices=['export', 'verify'])
+    parser.add_argument('--model-dir', default=DEFAULT_MODEL_DIR)
+    parser.add_argument('--folder', default=os.getcwd(), help='Corpus whose chunks are used as the sample')
+    parser.add_argument('--sample', type=int, default=256)
+    parser.add_argument('--no-quantize', action='store_true')
+    args = parser.parse_args()
+
+    if args.command == 'export':
+        export(args.model_dir, quantize=not args.no_quantize)
+    variants = [v for v in MODEL_FILES if os.path.exists(os.path.join(args.model_dir, MODEL_FILES[v]))]
+
+    store = CompactDocStore.from_folder(args.folder, text_splitter())
+    texts = store.texts(0, args.sample)
+    config = load_config(args.model_dir)
+    config['min_cosine'] = verify(args.model_dir, texts, variants)
+    config['threads'] = {}
+    for variant in variants:
+        best, throughput = tune_threads(args.model_dir, texts, variant)
+        config['threads'][variant] = best
+        passed = config['min_cosine'][variant] >= COSINE_TOLERANCE[variant]
+        print(f"{variant}: min cosine {config['min_cosine'][variant]:.5f} "
+              f"({'ok' if passed else 'FAILED'}, need {COSINE_TOLERANCE[variant]}), "
+              f"best threads {best} at {throughput[best]:.1f} embeddings/s")
+    _save_config(args.model_dir, config)
+
+    if not all(config['min_cosine'][v] >= COSINE_TOLERANCE[v] for v in variants):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
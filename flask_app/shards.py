@@ -0,0 +1,274 @@
+"""One index per asset class instead of a single Chroma collection.
+
+Mutual funds and equities are indexed into separate shards under
+<db>/shards/<name>, each with its own Chroma collection and compact
+docstore, and listed in <db>/shards.json. Equities can be split further
+into ticker groups. Questions that clearly concern one asset class or
+name a shard's ticker are searched in that shard only; the rest fan out
+to every shard in parallel and the per-shard top-k are merged by distance.
+
+    python shards.py build                 # build every shard from the JSON corpus
+    python shards.py rebuild equity        # rebuild one shard, leaving the others alone
+"""
+import os
+import re
+import json
+import shutil
+import time
+import argparse
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from chromadb.api.shared_system_client import SharedSystemClient
+from langchain_community.vectorstores import Chroma
+from langchain_core.retrievers import BaseRetriever
+from docstore import CompactDocStore, CompactRetriever, corpus_items, index_vectors
+from fund_facts import ISIN_RE
+
+SHARDS_MANIFEST = 'shards.json'
+
+MF_HINTS_RE = re.compile(
+    r'\b(funds?|schemes?|nav|sip|expense ratio|aum|amc|mutual|elss|direct plan|growth option|'
+    r'idcw|exit load|fund manager|benchmark index)\b', re.I
+)
+EQUITY_HINTS_RE = re.compile(
+    r'\b(shares?|stocks?|ltd|limited|quarterly|earnings|profit|revenue|market cap|ipo|'
+    r'promoters?|board|ceo|order book|buyback)\b', re.I
+)
+
+# Shard searches run on a shared pool so a fan-out costs one slow shard, not their sum
+_FANOUT_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix='shard-search')
+
+
+def asset_class(item):
+    return 'mf' if ISIN_RE.fullmatch(item.get("ticker", "")) else 'equity'
+
+
+def shard_for(item, ticker_groups=None):
+    """Shard name for a corpus entry: 'mf', 'equity', or 'equity_<group>' for grouped tickers"""
+    if asset_class(item) == 'mf':
+        return 'mf'
+    ticker = item.get("ticker", "")
+    for group, tickers in (ticker_groups or {}).items():
+        if ticker in tickers:
+            return f"equity_{group}"
+    return 'equity'
+
+
+def shard_path(db_path, name):
+    return os.path.join(db_path, 'shards', name)
+
+
+def is_sharded(db_path):
+    return os.path.exists(os.path.join(db_path, SHARDS_MANIFEST))
+
+
+def _items_by_shard(folder_path, ticker_groups=None):
+    """Parse the corpus once and group its (filename, item) pairs by shard"""
+    by_shard = {}
+    for filename, item in corpus_items(folder_path):
+        by_shard.setdefault(shard_for(item, ticker_groups), []).append((filename, item))
+    return by_shard
+
+
+def load_manifest(db_path):
+    with open(os.path.join(db_path, SHARDS_MANIFEST), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def _save_manifest(db_path, manifest):
+    path = os.path.join(db_path, SHARDS_MANIFEST)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_shard(items, db_path, name, embedding_model, text_splitter):
+    """Index one shard's (filename, item) pairs, replacing only that shard's directory"""
+    store = CompactDocStore.from_items(items, text_splitter)
+    path = shard_path(db_path, name)
+    # Chroma caches clients by path, so every build gets a fresh temporary directory
+    tmp_path = f"{path}.{os.getpid()}.{time.time_ns()}.tmp"
+    db = Chroma(persist_directory=tmp_path, embedding_function=embedding_model)
+    index_vectors(db, store, embedding_model)
+    store.save(os.path.join(tmp_path, 'docstore'))
+    release_clients(tmp_path)
+
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp_path, path)
+    tickers = sorted({item.get("ticker", "") for _, item in items})
+    return {"asset_class": 'mf' if name == 'mf' else 'equity', "chunks": len(store), "tickers": tickers}
+
+
+def create_sharded_index(folder_path, db_path, embedding_model, text_splitter, ticker_groups=None):
+    by_shard = _items_by_shard(folder_path, ticker_groups)
+    manifest = {"ticker_groups": ticker_groups or {}, "shards": {}}
+    for name in sorted(by_shard):
+        print(f"Building shard {name}...", file=sys.stderr)
+        manifest["shards"][name] = build_shard(by_shard[name], db_path, name, embedding_model, text_splitter)
+    os.makedirs(db_path, exist_ok=True)
+    _save_manifest(db_path, manifest)
+    return manifest
+
+
+def rebuild_shard(folder_path, db_path, name, embedding_model, text_splitter):
+    """Rebuild a single shard with the grouping recorded when the index was created"""
+    manifest = load_manifest(db_path)
+    # A typo would otherwise add an empty shard that every fan-out queries
+    if name not in manifest["shards"]:
+        raise ValueError(f"Unknown shard {name!r}; the index has {', '.join(sorted(manifest['shards']))}")
+    items = _items_by_shard(folder_path, manifest.get("ticker_groups", {})).get(name, [])
+    manifest["shards"][name] = build_shard(items, db_path, name, embedding_model, text_splitter)
+    # Rewriting the manifest also bumps the index version the app keys answers on
+    _save_manifest(db_path, manifest)
+    return manifest
+
+
+def release_clients(path):
+    """Stop and forget the cached Chroma clients opened under a directory"""
+    roots = {os.path.normpath(path), os.path.abspath(path)}
+    for identifier in list(SharedSystemClient._identifier_to_system):
+        normalized = os.path.normpath(identifier)
+        if normalized in roots or normalized.startswith(tuple(os.path.join(root, '') for root in roots)):
+            system = SharedSystemClient._identifier_to_system.pop(identifier)
+            try:
+                system.stop()
+            except Exception as e:
+                print(f"Error closing Chroma client for {identifier}: {str(e)}", file=sys.stderr)
+
+
+class ShardRouter:
+    """Picks the shards a question needs, falling back to all of them when unsure"""
+
+    def __init__(self, manifest):
+        self.shards = manifest["shards"]
+        self._ticker_index = {}
+        for name, shard in self.shards.items():
+            for ticker in shard.get("tickers", []):
+                # Two-letter tickers like LT collide with ordinary words
+                if len(ticker) >= 3:
+                    self._ticker_index.setdefault(ticker.lower(), set()).add(name)
+
+    def _by_class(self, cls):
+        return [name for name, shard in self.shards.items() if shard["asset_class"] == cls]
+
+    def route(self, question):
+        named = set()
+        for token in re.findall(r'[a-z0-9&]+', question.lower()):
+            named |= self._ticker_index.get(token, set())
+        hinted = set()
+        if MF_HINTS_RE.search(question):
+            hinted.add('mf')
+        if EQUITY_HINTS_RE.search(question):
+            hinted.add('equity')
+        if not named and not hinted:
+            return list(self.shards)
+
+        # "Which funds hold Reliance?" names an equity but needs the fund factsheets too
+        targets = set(named)
+        named_classes = {self.shards[name]["asset_class"] for name in named}
+        for cls in hinted - named_classes:
+            targets.update(self._by_class(cls))
+        return sorted(targets) or list(self.shards)
+
+
+class ShardedRetriever(BaseRetriever):
+    """Searches the routed shards in parallel and merges their top-k by distance"""
+
+    shards: dict
+    router: Any
+    embeddings: Any
+    search_kwargs: dict = {"k": 4}
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        vector = self.embeddings.embed_query(query)
+        return self.search_by_vectors([vector], [query])[0]
+
+    def search_by_vectors(self, vectors, questions=None):
+        """Top-k documents for each vector; with questions, only their routed shards are searched"""
+        if questions is None:
+            targets = [list(self.shards)] * len(vectors)
+        else:
+            targets = [self.router.route(question) for question in questions]
+
+        # Each shard is queried once with every vector routed to it
+        per_shard = {}
+        for i, names in enumerate(targets):
+            for name in names:
+                per_shard.setdefault(name, []).append(i)
+
+        def search(name):
+            rows = per_shard[name]
+            return name, rows, self.shards[name].search_with_scores([vectors[i] for i in rows])
+
+        if len(per_shard) == 1:
+            results = [search(name) for name in per_shard]
+        else:
+            results = list(_FANOUT_POOL.map(search, list(per_shard)))
+
+        merged = [[] for _ in vectors]
+        for name, rows, hits in results:
+            for i, pairs in zip(rows, hits):
+                merged[i].extend((distance, name, row) for distance, row in pairs)
+
+        k = self.search_kwargs.get("k", 4)
+        return [
+            [self.shards[name].store.document(row) for _, name, row in sorted(candidates)[:k]]
+            for candidates in merged
+        ]
+
+
+def load_sharded_retriever(db_path, embedding_model, k=4):
+    manifest = load_manifest(db_path)
+    shards = {}
+    for name in manifest["shards"]:
+        path = shard_path(db_path, name)
+        shards[name] = CompactRetriever(
+            vectorstore=Chroma(persist_directory=path, embedding_function=embedding_model),
+            store=CompactDocStore.load(os.path.join(path, 'docstore')),
+            search_kwargs={"k": k}
+        )
+    return ShardedRetriever(
+        shards=shards, router=ShardRouter(manifest), embeddings=embedding_model, search_kwargs={"k": k}
+    )
+
+
+def main():
+    from backend import default_embedding_model, text_splitter
+    from snapshots import is_snapshot_root
+
+    parser = argparse.ArgumentParser(description="Build or rebuild the sharded index")
+    parser.add_argument('command', choices=['build', 'rebuild'])
+    parser.add_argument('shard', nargs='?', help='Shard to rebuild, e.g. mf or equity')
+    parser.add_argument('--folder', default=os.getcwd())
+    parser.add_argument('--db', default='./chroma_db')
+    parser.add_argument('--ticker-groups', help='JSON file mapping group name to a list of tickers')
+    args = parser.parse_args()
+
+    # Published snapshots are immutable and have no top-level shards.json to rebuild from
+    if is_snapshot_root(args.db):
+        hint = f"snapshots.py build --shard {args.shard}" if args.command == 'rebuild' else "snapshots.py build"
+        parser.error(f"{args.db} holds versioned snapshots; use `python {hint} --db {args.db}` instead")
+
+    embedding_model = default_embedding_model()
+    if args.command == 'build':
+        ticker_groups = None
+        if args.ticker_groups:
+            with open(args.ticker_groups, 'r', encoding='utf-8') as f:
+                ticker_groups = json.load(f)
+        manifest = create_sharded_index(args.folder, args.db, embedding_model, text_splitter(), ticker_groups)
+    else:
+        if not args.shard:
+            parser.error("rebuild needs a shard name")
+        try:
+            manifest = rebuild_shard(args.folder, args.db, args.shard, embedding_model, text_splitter())
+        except ValueError as e:
+            parser.error(str(e))
+    for name, shard in manifest["shards"].items():
+        print(f"{name}: {shard['chunks']} chunks, {len(shard['tickers'])} tickers")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,298 @@
+"""Versioned index snapshots, published by an atomic pointer switch.
+
+Each build goes to <db>/snapshots/<version> and is never modified after
+it is published. Besides the shards it holds facts.json, the fund facts
+table parsed from the same corpus. <db>/CURRENT names the published
+version and is replaced atomically, and <db>/history.json records when
+each version went live. A running app polls CURRENT, loads a new version
+in the background and swaps it in between requests, so ingestion never
+takes the API down.
+
+    python snapshots.py build                  # full rebuild, publish, collect old snapshots
+    python snapshots.py build --shard equity   # copy the current snapshot, rebuild one shard
+    python snapshots.py publish <version>      # roll back or forward to an existing snapshot
+    python snapshots.py gc --keep 3
+    python snapshots.py list
+"""
+import os
+import json
+import time
+import shutil
+import argparse
+import threading
+import sys
+from contextlib import contextmanager
+
+from fund_facts import FundFactsTable
+from shards import create_sharded_index, is_sharded, load_manifest, rebuild_shard, release_clients
+
+POINTER_FILE = 'CURRENT'
+HISTORY_FILE = 'history.json'
+FACTS_FILE = 'facts.json'
+
+
+def snapshot_path(db_path, version):
+    return os.path.join(db_path, 'snapshots', version)
+
+
+def facts_path(db_path, version):
+    return os.path.join(snapshot_path(db_path, version), FACTS_FILE)
+
+
+def is_snapshot_root(db_path):
+    return os.path.exists(os.path.join(db_path, POINTER_FILE))
+
+
+def current_version(db_path):
+    try:
+        with open(os.path.join(db_path, POINTER_FILE), 'r', encoding='utf-8') as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def load_history(db_path):
+    path = os.path.join(db_path, HISTORY_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def new_version():
+    # Sorts by build time; the microsecond suffix keeps back-to-back builds apart
+    return time.strftime('%Y%m%dT%H%M%S', time.gmtime()) + f"-{time.time_ns() // 1000 % 10**6:06d}"
+
+
+def build_snapshot(folder_path, db_path, embedding_model, text_splitter, ticker_groups=None, shard=None):
+    """Build an unpublished snapshot; with shard, only that shard is rebuilt from a copy of the current one"""
+    version = new_version()
+    path = snapshot_path(db_path, version)
+    base = current_version(db_path)
+
+    if shard is not None and base is not None:
+        shutil.copytree(snapshot_path(db_path, base), path)
+        try:
+            rebuild_shard(folder_path, path, shard, embedding_model, text_splitter)
+        except BaseException:
+            shutil.rmtree(path, ignore_errors=True)
+            raise
+    else:
+        if ticker_groups is None and base is not None:
+            ticker_groups = load_manifest(snapshot_path(db_path, base)).get("ticker_groups")
+        create_sharded_index(folder_path, path, embedding_model, text_splitter, ticker_groups)
+    # The facts come from the fund pages, so an equity-only rebuild keeps the copied table
+    if shard in (None, 'mf') or not os.path.exists(facts_path(db_path, version)):
+        FundFactsTable.from_folder(folder_path).save(facts_path(db_path, version))
+    return version
+
+
+def publish(db_path, version):
+    """Point CURRENT at a finished snapshot; readers see either the old or the new version"""
+    if not is_sharded(snapshot_path(db_path, version)):
+        raise ValueError(f"Snapshot {version} is missing or incomplete")
+    history = load_history(db_path)
+    history.append({"version": version, "published_at": time.time()})
+    _write_atomic(os.path.join(db_path, HISTORY_FILE), json.dumps(history, indent=2))
+    _write_atomic(os.path.join(db_path, POINTER_FILE), version)
+
+
+def gc_snapshots(db_path, keep=3, grace_seconds=600, stale_build_seconds=24 * 3600, now=None):
+    """Delete snapshots outside the retention policy, returning the removed versions.
+
+    The current version and the last `keep` published ones are always kept.
+    Older snapshots are only removed `grace_seconds` after they were
+    superseded, so apps that have not switched yet can finish their
+    requests. Snapshots that were never published count as abandoned
+    builds after `stale_build_seconds`.
+    """
+    now = time.time() if now is None else now
+    root = os.path.join(db_path, 'snapshots')
+    if not os.path.isdir(root):
+        return []
+
+    history = load_history(db_path)
+    kept = {entry["version"] for entry in history[-keep:]} if keep else set()
+    kept.add(current_version(db_path))
+    superseded_at = {}
+    for entry, successor in zip(history, history[1:]):
+        superseded_at[entry["version"]] = successor["published_at"]
+    published = {entry["version"] for entry in history}
+
+    removed = []
+    for version in sorted(os.listdir(root)):
+        path = os.path.join(root, version)
+        if version in kept or not os.path.isdir(path):
+            continue
+        if version in published:
+            # A version published more than once is superseded by its latest successor
+            expired = now - superseded_at.get(version, now) >= grace_seconds
+        else:
+            expired = now - os.path.getmtime(path) >= stale_build_seconds
+        if expired:
+            shutil.rmtree(path, ignore_errors=True)
+            removed.append(version)
+
+    if removed:
+        remaining = [entry for entry in history if entry["version"] not in removed]
+        _write_atomic(os.path.join(db_path, HISTORY_FILE), json.dumps(remaining, indent=2))
+    return removed
+
+
+class _Loaded:
+    def __init__(self, version, chain, facts, path):
+        self.version = version
+        self.chain = chain
+        self.facts = facts
+        self.path = path
+        self.in_flight = 0
+        self.retired = False
+
+
+class LiveIndex:
+    """The QA chain and facts table of the published snapshot, hot-swapped when CURRENT changes.
+
+    A watcher thread polls CURRENT and loads a new version next to the
+    active one with load_snapshot(version) -> (chain, facts), then swaps
+    both in together. Requests take the active snapshot with use() and
+    keep it until they finish, even if a newer one is swapped in
+    meanwhile. A superseded snapshot's Chroma clients are closed once its
+    last request is done.
+    """
+
+    def __init__(self, db_path=None, load_snapshot=None, check_interval=5.0, *, chain=None, version=None,
+                 facts=None):
+        self.db_path = db_path
+        self._load_snapshot = load_snapshot
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._loading = False
+        self._failed_version = None
+        self._counts = {'swaps': 0, 'reload_failures': 0}
+
+        if load_snapshot is None:
+            # Fixed mode: serve the given chain and facts, with nothing to watch or release
+            self.check_interval = None
+            self._active = _Loaded(version, chain, facts, None)
+            return
+
+        version = current_version(db_path)
+        self._active = _Loaded(version, *load_snapshot(version), snapshot_path(db_path, version))
+        if check_interval:
+            threading.Thread(target=self._watch, daemon=True, name='index-watcher').start()
+
+    @classmethod
+    def fixed(cls, chain, version=None, facts=None):
+        """A LiveIndex that serves one chain and facts table and never reloads"""
+        return cls(chain=chain, version=version, facts=facts)
+
+    @property
+    def version(self):
+        return self._active.version
+
+    @contextmanager
+    def use(self):
+        """Yield (version, chain, facts) for one request"""
+        with self._lock:
+            loaded = self._active
+            loaded.in_flight += 1
+        try:
+            yield loaded.version, loaded.chain, loaded.facts
+        finally:
+            self._finish(loaded)
+
+    def _finish(self, loaded):
+        with self._lock:
+            loaded.in_flight -= 1
+            release = loaded.retired and loaded.in_flight == 0
+        if release and loaded.path:
+            release_clients(loaded.path)
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_interval)
+            try:
+                version = current_version(self.db_path)
+            except OSError as e:
+                print(f"Error reading the published index version: {str(e)}", file=sys.stderr)
+                continue
+            if version is not None and version not in (self._active.version, self._failed_version):
+                self._load(version)
+
+    def _load(self, version):
+        with self._lock:
+            self._loading = True
+        try:
+            chain, facts = self._load_snapshot(version)
+        except Exception as e:
+            print(f"Error loading index snapshot {version}: {str(e)}", file=sys.stderr)
+            with self._lock:
+                self._failed_version = version
+                self._counts['reload_failures'] += 1
+                self._loading = False
+            return
+
+        with self._lock:
+            previous = self._active
+            self._active = _Loaded(version, chain, facts, snapshot_path(self.db_path, version))
+            previous.retired = True
+            idle = previous.in_flight == 0
+            self._counts['swaps'] += 1
+            self._loading = False
+        print(f"Swapped index snapshot {previous.version} -> {version}", file=sys.stderr)
+        if idle:
+            release_clients(previous.path)
+
+    def stats(self):
+        with self._lock:
+            return {**self._counts, 'loading': int(self._loading), 'in_flight': self._active.in_flight}
+
+
+def main():
+    from backend import default_embedding_model, text_splitter
+
+    parser = argparse.ArgumentParser(description="Build, publish and collect index snapshots")
+    parser.add_argument('command', choices=['build', 'publish', 'gc', 'list'])
+    parser.add_argument('version', nargs='?', help='Snapshot to publish')
+    parser.add_argument('--folder', default=os.getcwd())
+    parser.add_argument('--db', default='./chroma_db')
+    parser.add_argument('--shard', help='Rebuild only this shard on top of the current snapshot')
+    parser.add_argument('--keep', type=int, default=3, help='Published snapshots to retain')
+    parser.add_argument('--grace', type=int, default=600,
+                        help='Seconds a superseded snapshot is kept for apps still using it')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        try:
+            version = build_snapshot(args.folder, args.db, default_embedding_model(), text_splitter(), shard=args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        publish(args.db, version)
+        print(f"Published snapshot {version}")
+    elif args.command == 'publish':
+        if not args.version:
+            parser.error("publish needs a snapshot version")
+        publish(args.db, args.version)
+        print(f"Published snapshot {args.version}")
+
+    if args.command in ('build', 'publish', 'gc'):
+        for version in gc_snapshots(args.db, keep=args.keep, grace_seconds=args.grace):
+            print(f"Removed snapshot {version}")
+    if args.command == 'list':
+        current = current_version(args.db)
+        for entry in load_history(args.db):
+            marker = '*' if entry["version"] == current else ' '
+            print(f"{marker} {entry['version']}  published {time.ctime(entry['published_at'])}")
+
+
+if __name__ == "__main__":
+    main()
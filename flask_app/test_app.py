@@ -0,0 +1,41 @@
+import threading
+
+import app as app_module
+from app import create_app
+from fund_facts import FundFactsTable
+
+
+class BlockingChain:
+    """A RetrievalQA stand-in whose call hangs until released"""
+
+    def __init__(self):
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def invoke(self, question, config=None):
+        self.started.set()
+        self.release.wait(5)
+        return {"result": "answer", "source_documents": []}
+
+
+def test_ask_times_out_waiting_on_a_hung_identical_question(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, 'ASK_WAIT_SECONDS', 0.05)
+    chain = BlockingChain()
+    client = create_app(qa_chain=chain, db_path=str(tmp_path / 'db'), facts=FundFactsTable()).test_client()
+
+    leader = {}
+    thread = threading.Thread(
+        target=lambda: leader.update(response=client.post('/ask', json={"question": "Why did markets fall?"}))
+    )
+    thread.start()
+    chain.started.wait(5)
+
+    waiter = client.post('/ask', json={"question": "why did  markets fall?"})
+    assert waiter.status_code == 504
+    assert "error" in waiter.json
+
+    chain.release.set()
+    thread.join(5)
+    assert leader['response'].status_code == 200
+    assert leader['response'].json["answer"] == "answer"
+    assert client.get('/stats').json["coalescing"]["timeouts"] == 1
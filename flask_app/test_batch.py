@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+
+from langchain.schema import Document
+
+import instrumentation
+from app import create_app
+from backend import answer_batch
+from fund_facts import FundFactsTable
+from shards import ShardedRetriever
+
+
+class CountingEmbeddings:
+    def __init__(self, error=None):
+        self.calls = []
+        self.error = error
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        if self.error:
+            raise self.error
+        return [[float(len(text))] for text in texts]
+
+
+class StubRetriever(ShardedRetriever):
+    def search_by_vectors(self, vectors, questions=None):
+        return [[Document(page_content=f"context for {question}")] for question in questions]
+
+
+class StubCombineChain:
+    def __init__(self, failing=(), delay=0.0):
+        self.failing = set(failing)
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.questions = []
+
+    def invoke(self, inputs, config=None):
+        question = inputs["question"]
+        with self.lock:
+            self.questions.append(question)
+        time.sleep(self.delay)
+        if question in self.failing:
+            raise RuntimeError(f"generation failed for {question}")
+        return {"output_text": f"answer to {question} from {inputs['input_documents'][0].page_content}"}
+
+
+class StubChain:
+    """Just the parts of a RetrievalQA chain that answer_batch and /ask use"""
+
+    def __init__(self, embeddings=None, **combine_kwargs):
+        self.embeddings = embeddings or CountingEmbeddings()
+        self.retriever = StubRetriever(shards={}, router=None, embeddings=self.embeddings)
+        self.combine_documents_chain = StubCombineChain(**combine_kwargs)
+
+    def invoke(self, question, config=None):
+        return {"result": f"single answer to {question}", "source_documents": []}
+
+
+def collect(chain, questions, **kwargs):
+    return sorted(answer_batch(chain, questions, **kwargs), key=lambda item: item[0])
+
+
+def test_answer_batch_answers_repeated_questions_once():
+    chain = StubChain()
+    results = collect(chain, ["What is NAV?", "  what is nav? ", "Why did ITC fall?"])
+
+    assert chain.embeddings.calls == [["What is NAV?", "Why did ITC fall?"]]
+    assert sorted(chain.combine_documents_chain.questions) == ["What is NAV?", "Why did ITC fall?"]
+    assert [i for i, _, _ in results] == [0, 1, 2]
+    assert results[0][1] is results[1][1]
+    assert results[2][1]["result"] == "answer to Why did ITC fall? from context for Why did ITC fall?"
+    assert results[2][1]["source_documents"][0].page_content == "context for Why did ITC fall?"
+    assert all(error is None for _, _, error in results)
+
+
+def test_answer_batch_reports_generation_errors_per_question():
+    chain = StubChain(failing={"bad"})
+    results = collect(chain, ["good", "bad", "BAD", "fine"])
+
+    assert [(i, response is None, str(error) if error else None) for i, response, error in results] == [
+        (0, False, None),
+        (1, True, "generation failed for bad"),
+        (2, True, "generation failed for bad"),
+        (3, False, None),
+    ]
+
+
+def test_answer_batch_reports_retrieval_failure_for_every_question():
+    error = RuntimeError("embedding service down")
+    chain = StubChain(embeddings=CountingEmbeddings(error=error))
+    results = collect(chain, ["a", "b", "A"])
+
+    assert results == [(0, None, error), (1, None, error), (2, None, error)]
+    assert chain.combine_documents_chain.questions == []
+
+
+def test_answer_batch_cancels_queued_generations_when_consumer_stops():
+    chain = StubChain(delay=0.05)
+    batch = answer_batch(chain, [f"question {i}" for i in range(10)], max_concurrency=1)
+
+    next(batch)
+    batch.close()
+    time.sleep(0.3)
+
+    # Only the generations already running when the consumer left have run
+    assert len(chain.combine_documents_chain.questions) <= 2
+
+
+def make_client(chain, tmp_path):
+    facts = FundFactsTable()
+    facts.add({"ticker": "INF179KB1HT1", "name": "HDFC Overnight Fund Direct Plan Growth",
+               "clean_data": ["It has a low expense ratio of 0.10%."]}, 'FINAL_MF.json')
+    return create_app(qa_chain=chain, db_path=str(tmp_path / 'db'), facts=facts).test_client()
+
+
+def test_ask_batch_streams_facts_rag_and_errors(tmp_path):
+    chain = StubChain(failing={"Why did markets fall?"})
+    client = make_client(chain, tmp_path)
+    questions = [
+        "What is the expense ratio of HDFC Overnight Fund?",
+        "Why did markets fall?",
+        "What did TCS announce?",
+        "what did tcs announce?",
+    ]
+
+    response = client.post('/ask_batch', json={"questions": questions})
+    assert response.status_code == 200
+    assert response.mimetype == "application/x-ndjson"
+    lines = {item["index"]: item for item in map(json.loads, response.data.decode().splitlines())}
+
+    assert sorted(lines) == [0, 1, 2, 3]
+    assert lines[0]["route"] == "facts"
+    assert lines[0]["answer"] == "The expense ratio of HDFC Overnight Fund Direct Plan Growth is 0.1%."
+    assert lines[1] == {"index": 1, "question": questions[1], "error": "generation failed for Why did markets fall?"}
+    assert lines[2]["route"] == lines[3]["route"] == "rag"
+    assert lines[2]["answer"] == lines[3]["answer"]
+    assert lines[3]["question"] == "what did tcs announce?"
+    assert chain.combine_documents_chain.questions.count("What did TCS announce?") == 1
+
+
+def test_ask_batch_records_rag_answers_under_their_own_route(tmp_path):
+    client = make_client(StubChain(), tmp_path)
+    client.post('/ask_batch', json={"questions": ["Why did markets fall?"]}).get_data()
+
+    rendered = instrumentation.render_metrics()
+    if rendered is None:
+        return
+    body = rendered[0].decode()
+    assert 'rag_route_latency_seconds_count{route="rag_batch"}' in body
+
+
+def test_ask_batch_rejects_bad_input(tmp_path):
+    client = make_client(StubChain(), tmp_path)
+
+    assert client.post('/ask_batch', json={"questions": []}).status_code == 400
+    assert client.post('/ask_batch', json={"questions": ["ok", ""]}).status_code == 400
+    assert client.post('/ask_batch', json={"questions": "not a list"}).status_code == 400
+    assert client.post('/ask_batch', json={"questions": ["q"] * 101}).status_code == 400
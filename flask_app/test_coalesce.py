@@ -0,0 +1,166 @@
+import threading
+import time
+
+import pytest
+
+import coalesce
+from coalesce import SingleFlight, normalize_question
+
+WAITERS = 5
+
+
+class CountingEvent(threading.Event):
+    """An Event that knows how many threads have started waiting on it"""
+
+    def __init__(self):
+        super().__init__()
+        self._count_lock = threading.Lock()
+        self.waiters = 0
+
+    def wait(self, timeout=None):
+        with self._count_lock:
+            self.waiters += 1
+        return super().wait(timeout)
+
+
+class CountingCall(coalesce._Call):
+    def __init__(self):
+        super().__init__()
+        self.done = CountingEvent()
+
+
+class Cancelled(BaseException):
+    """Like the exception a worker raises into a request it abandons"""
+
+
+def wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("condition not reached")
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def flight(monkeypatch):
+    monkeypatch.setattr(coalesce, '_Call', CountingCall)
+    return SingleFlight()
+
+
+def run_in_threads(count, target):
+    """Start count threads running target(); returns a list filled with ('ok'|'error', value)"""
+    outcomes = [None] * count
+
+    def run(i):
+        try:
+            outcomes[i] = ('ok', target())
+        except BaseException as e:
+            outcomes[i] = ('error', e)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    return threads, outcomes
+
+
+def join(threads):
+    for thread in threads:
+        thread.join(5)
+        assert not thread.is_alive()
+
+
+def waiting_on(flight, key, count):
+    return lambda: key in flight._calls and flight._calls[key].done.waiters >= count
+
+
+def test_concurrent_callers_share_one_result(flight):
+    release = threading.Event()
+    calls = []
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return {"answer": 42}
+
+    threads, outcomes = run_in_threads(WAITERS + 1, lambda: flight.do('q', compute))
+    wait_for(waiting_on(flight, 'q', WAITERS))
+    release.set()
+    join(threads)
+
+    assert len(calls) == 1
+    assert all(kind == 'ok' for kind, _ in outcomes)
+    # Every caller gets the very same object
+    assert len({id(value) for _, value in outcomes}) == 1
+    stats = flight.stats()
+    assert (stats['leaders'], stats['coalesced'], stats['in_flight']) == (1, WAITERS, 0)
+
+
+def test_error_fans_out_to_every_waiter(flight):
+    release = threading.Event()
+    error = ValueError("LLM backend unavailable")
+
+    def compute():
+        release.wait(5)
+        raise error
+
+    threads, outcomes = run_in_threads(WAITERS + 1, lambda: flight.do('q', compute))
+    wait_for(waiting_on(flight, 'q', WAITERS))
+    release.set()
+    join(threads)
+
+    assert outcomes == [('error', error)] * (WAITERS + 1)
+    stats = flight.stats()
+    assert (stats['leaders'], stats['errors'], stats['coalesced']) == (1, 1, WAITERS)
+
+
+def test_cancelled_leader_hands_over_to_a_waiter(flight):
+    leader_started = threading.Event()
+    cancel = threading.Event()
+
+    def cancelled_leader():
+        leader_started.set()
+        cancel.wait(5)
+        raise Cancelled()
+
+    leader_threads, leader_outcome = run_in_threads(1, lambda: flight.do('q', cancelled_leader))
+    leader_started.wait(5)
+
+    def successor():
+        # Hold on until the remaining waiters have moved to the new computation
+        wait_for(waiting_on(flight, 'q', WAITERS - 1))
+        return "answer"
+
+    threads, outcomes = run_in_threads(WAITERS, lambda: flight.do('q', successor))
+    wait_for(waiting_on(flight, 'q', WAITERS))
+    cancel.set()
+    join(leader_threads + threads)
+
+    # The cancellation stays with the leader; the waiters get the new leader's answer
+    assert isinstance(leader_outcome[0][1], Cancelled)
+    assert outcomes == [('ok', "answer")] * WAITERS
+    stats = flight.stats()
+    assert (stats['leaders'], stats['cancelled'], stats['coalesced'], stats['errors']) == (2, 1, WAITERS - 1, 0)
+
+
+def test_waiter_times_out_without_stopping_the_leader(flight):
+    release = threading.Event()
+    leader_threads, leader_outcome = run_in_threads(1, lambda: flight.do('q', lambda: release.wait(5) and "late"))
+    wait_for(lambda: 'q' in flight._calls)
+
+    with pytest.raises(TimeoutError):
+        flight.do('q', lambda: "unused", timeout=0.05)
+    release.set()
+    join(leader_threads)
+
+    assert leader_outcome == [('ok', "late")]
+    assert flight.stats()['timeouts'] == 1
+
+
+def test_different_keys_do_not_coalesce(flight):
+    assert flight.do('a', lambda: 1) == 1
+    assert flight.do('b', lambda: 2) == 2
+    assert flight.stats()['leaders'] == 2
+
+
+def test_normalize_question():
+    assert normalize_question("  What is  the NAV?\n") == normalize_question("what is the nav?")
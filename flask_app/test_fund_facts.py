@@ -0,0 +1,91 @@
+import pytest
+
+from fund_facts import FactRouter, FundFactsTable
+
+FUNDS = [
+    ("INF179KB1HT1", "HDFC Overnight Fund Direct Plan Growth",
+     "It offers very low risk and has delivered returns of 6.59% over the past year and 6.18% over three years. "
+     "It has a low expense ratio of 0.10%."),
+    ("INF754K01LO0", "BHARAT Bond FOF - April 2031 Direct Plan Growth",
+     "A moderate risk fund of funds with an expense ratio of 0.08%."),
+    ("INF754K01NY5", "BHARAT Bond ETF FOF - April 2032 Direct Plan Growth",
+     "A moderate risk fund of funds with an expense ratio of 0.06%."),
+    ("INF109K016L0", "ICICI Prudential Bluechip Fund Direct Plan Growth",
+     "A very high risk large cap fund. Top holdings include HDFC Bank, ICICI Bank and Reliance Industries."),
+    ("INF200K01UM9", "SBI Long Term Equity Fund Direct Plan Growth", "A high risk ELSS fund."),
+    ("INF109K01Q49", "ICICI Prudential Liquid Fund Direct Plan Growth", "A low to moderate risk fund."),
+    ("INF109K01Q50", "ICICI Prudential Liquid Plus Fund Direct Plan Growth", "A moderate risk fund."),
+]
+
+
+@pytest.fixture(scope='module')
+def router():
+    table = FundFactsTable()
+    for isin, name, text in FUNDS:
+        table.add({"ticker": isin, "name": name, "clean_data": [text]}, 'FINAL_MF.json')
+    return FactRouter(table)
+
+
+@pytest.mark.parametrize("question, answer", [
+    ("What is the expense ratio of HDFC Overnight Fund?",
+     "The expense ratio of HDFC Overnight Fund Direct Plan Growth is 0.1%."),
+    ("Expense ratio of HDFC Overnight Fund Direct Plan Growth",
+     "The expense ratio of HDFC Overnight Fund Direct Plan Growth is 0.1%."),
+    ("What are the 1 year returns of HDFC Overnight Fund?",
+     "HDFC Overnight Fund Direct Plan Growth has returned 6.59% over 1 year."),
+    ("Expense ratio of BHARAT Bond FOF April 2031?",
+     "The expense ratio of BHARAT Bond FOF - April 2031 Direct Plan Growth is 0.08%."),
+    ("How risky is BHARAT Bond ETF FOF April 2032?",
+     "BHARAT Bond ETF FOF - April 2032 Direct Plan Growth is categorized as a moderate risk fund."),
+    ("Top holdings of ICICI Prudential Bluechip Fund",
+     "Top holdings of ICICI Prudential Bluechip Fund Direct Plan Growth include HDFC Bank, ICICI Bank, "
+     "Reliance Industries."),
+    # A name contained in another fund's name is not a second fund
+    ("Risk level of ICICI Prudential Liquid Plus Fund?",
+     "ICICI Prudential Liquid Plus Fund Direct Plan Growth is categorized as a moderate risk fund."),
+])
+def test_plain_lookups_are_answered(router, question, answer):
+    response = router.answer(question)
+    assert response["answer"] == answer
+    assert response["sources"][0]["metadata"]["source_file"] == 'FINAL_MF.json'
+
+
+@pytest.mark.parametrize("question", [
+    # Two funds named
+    "What is the risk level of ICICI Prudential Bluechip Fund and SBI Long Term Equity Fund?",
+    "Expense ratio of BHARAT Bond FOF April 2031 and BHARAT Bond ETF FOF April 2032",
+    # Comparisons and judgement
+    "What is the expense ratio of HDFC Overnight Fund compared to BHARAT Bond FOF April 2031?",
+    "Is the expense ratio of HDFC Overnight Fund higher than the category average?",
+    "Why is HDFC Overnight Fund low risk?",
+    # Figures for another period or plan than the table holds
+    "What was the 1 year return of HDFC Overnight Fund in 2022?",
+    "What is the expense ratio of HDFC Overnight Fund regular plan?",
+    "Expense ratio of HDFC Overnight Fund IDCW option",
+    # Fields the table does not hold, no fund, or no field
+    "What are the top holdings of HDFC Overnight Fund?",
+    "What is the expense ratio of Axis Bluechip Fund?",
+    "Tell me about HDFC Overnight Fund",
+])
+def test_everything_else_goes_to_rag(router, question):
+    assert router.answer(question) is None
+
+
+def test_answers_from_the_table_it_is_given(router):
+    other = FundFactsTable()
+    other.add({"ticker": "INF179KB1HT1", "name": "HDFC Overnight Fund Direct Plan Growth",
+               "clean_data": ["It has an expense ratio of 0.20%."]}, 'new.json')
+    question = "What is the expense ratio of HDFC Overnight Fund?"
+
+    assert "0.2%" in router.answer(question, other)["answer"]
+    assert "0.1%" in router.answer(question)["answer"]
+
+
+def test_save_and_load_round_trip(router, tmp_path):
+    path = str(tmp_path / 'facts.json')
+    router.table.save(path)
+    loaded = FundFactsTable.load(path)
+
+    assert loaded.funds == router.table.funds
+    question = "Risk level of ICICI Prudential Liquid Fund?"
+    assert FactRouter(loaded).answer(question) == router.answer(question)
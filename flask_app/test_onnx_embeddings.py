@@ -0,0 +1,114 @@
+import json
+import os
+
+import numpy as np
+import pytest
+from tokenizers import Tokenizer, models, pre_tokenizers
+
+import onnx_embeddings
+from onnx_embeddings import CONFIG_FILE, MODEL_FILES, OnnxEmbeddings, min_cosine
+
+VOCAB = ['[PAD]', '[UNK]', 'alpha', 'beta', 'gamma', 'delta', 'epsilon']
+PAD_VALUE = 50.0
+
+
+class FakeInput:
+    def __init__(self, name):
+        self.name = name
+
+
+class FakeSession:
+    """Stands in for the exported model: each token's hidden state is the one-hot of its id"""
+
+    calls = []
+
+    def __init__(self, path, options, providers=None):
+        self.path = path
+
+    def get_inputs(self):
+        return [FakeInput('input_ids'), FakeInput('attention_mask')]
+
+    def run(self, outputs, feed):
+        assert set(feed) == {'input_ids', 'attention_mask'}
+        ids = feed['input_ids']
+        FakeSession.calls.append(ids.shape)
+        hidden = np.eye(len(VOCAB), dtype=np.float32)[ids]
+        # Padding gets a loud vector so any leak into the mean shows up
+        hidden[feed['attention_mask'] == 0] = PAD_VALUE
+        return [hidden]
+
+
+@pytest.fixture
+def model_dir(tmp_path, monkeypatch):
+    tokenizer = Tokenizer(models.WordPiece({token: i for i, token in enumerate(VOCAB)}, unk_token='[UNK]'))
+    tokenizer.pre_tokenizer = pre_tokenizers.Whitespace()
+    tokenizer.save(str(tmp_path / 'tokenizer.json'))
+    for filename in MODEL_FILES.values():
+        (tmp_path / filename).write_bytes(b'')
+    write_config(tmp_path, {'fp32': 0.9995, 'int8': 0.99})
+
+    FakeSession.calls = []
+    monkeypatch.setattr(onnx_embeddings.ort, 'InferenceSession', FakeSession)
+    return str(tmp_path)
+
+
+def write_config(model_dir, cosines):
+    with open(os.path.join(model_dir, CONFIG_FILE), 'w', encoding='utf-8') as f:
+        json.dump({'min_cosine': cosines, 'threads': {'fp32': 1, 'int8': 1}}, f)
+
+
+def expected(tokens):
+    counts = np.zeros(len(VOCAB), dtype=np.float32)
+    for token in tokens.split():
+        counts[VOCAB.index(token)] += 1
+    return counts / np.linalg.norm(counts)
+
+
+def test_mean_pooling_ignores_padding(model_dir):
+    model = OnnxEmbeddings(model_dir)
+    short, long = model.embed_documents(['alpha beta', 'alpha gamma gamma delta epsilon'])
+
+    np.testing.assert_allclose(short, expected('alpha beta'), atol=1e-6)
+    np.testing.assert_allclose(long, expected('alpha gamma gamma delta epsilon'), atol=1e-6)
+
+
+def test_vectors_are_unit_length(model_dir):
+    vectors = OnnxEmbeddings(model_dir).embed_documents(['alpha', 'beta beta gamma', 'delta epsilon alpha beta'])
+    np.testing.assert_allclose(np.linalg.norm(vectors, axis=1), 1.0, atol=1e-6)
+
+
+def test_length_sorted_batches_keep_input_order(model_dir):
+    texts = ['alpha beta gamma delta', 'beta', 'gamma delta epsilon alpha', 'epsilon']
+    model = OnnxEmbeddings(model_dir, batch_size=2)
+    vectors = model.embed_documents(texts)
+
+    # The two short and the two long texts are batched together, so nothing is padded
+    assert sorted(FakeSession.calls) == [(2, 1), (2, 4)]
+    for text, vector in zip(texts, vectors):
+        np.testing.assert_allclose(vector, expected(text), atol=1e-6)
+        np.testing.assert_allclose(vector, model.embed_query(text), atol=1e-6)
+
+
+def test_embed_documents_empty(model_dir):
+    assert OnnxEmbeddings(model_dir).embed_documents([]) == []
+
+
+def test_refuses_model_below_tolerance(model_dir):
+    write_config(model_dir, {'fp32': 0.9995, 'int8': 0.95})
+    OnnxEmbeddings(model_dir)
+    with pytest.raises(ValueError, match='int8'):
+        OnnxEmbeddings(model_dir, quantized=True)
+
+
+def test_refuses_unverified_model(model_dir):
+    os.remove(os.path.join(model_dir, CONFIG_FILE))
+    with pytest.raises(ValueError, match='has not passed the cosine check'):
+        OnnxEmbeddings(model_dir)
+    # export itself loads the variants before they have been verified
+    assert OnnxEmbeddings(model_dir, verified_only=False).embed_query('alpha') is not None
+
+
+def test_min_cosine():
+    reference = [[1.0, 0.0], [0.0, 2.0]]
+    assert min_cosine(reference, [[2.0, 0.0], [0.0, 1.0]]) == pytest.approx(1.0)
+    assert min_cosine(reference, [[1.0, 0.0], [1.0, 1.0]]) == pytest.approx(2 ** -0.5)
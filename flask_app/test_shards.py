@@ -0,0 +1,67 @@
+import json
+import os
+
+import pytest
+
+import snapshots
+from shards import SHARDS_MANIFEST, ShardRouter, rebuild_shard
+from snapshots import build_snapshot, publish, snapshot_path
+
+MANIFEST = {
+    "ticker_groups": {"banks": ["HDFCBANK"]},
+    "shards": {
+        "mf": {"asset_class": "mf", "chunks": 17, "tickers": ["INF109K012K1"]},
+        "equity": {"asset_class": "equity", "chunks": 700, "tickers": ["RELIANCE", "ITC", "TCS", "LT"]},
+        "equity_banks": {"asset_class": "equity", "chunks": 100, "tickers": ["HDFCBANK"]},
+    },
+}
+
+
+@pytest.mark.parametrize("question, shards", [
+    # A named ticker plus a hint for the other asset class needs both
+    ("Which mutual funds hold Reliance?", ['equity', 'mf']),
+    ("expense ratio of funds holding ITC", ['equity', 'mf']),
+    ("Which funds hold HDFCBANK?", ['equity_banks', 'mf']),
+    # A named ticker whose class matches the hints stays on its shard
+    ("Latest on ITC shares", ['equity']),
+    ("How did Reliance do?", ['equity']),
+    ("HDFCBANK quarterly profit", ['equity_banks']),
+    # Hints alone pick the asset class
+    ("expense ratio of HDFC Flexi Cap fund", ['mf']),
+    ("which stocks hit a 52 week high", ['equity', 'equity_banks']),
+    # Two-letter tickers are not matched as words
+    ("Let me know the news", ['mf', 'equity', 'equity_banks']),
+])
+def test_route(question, shards):
+    assert sorted(ShardRouter(MANIFEST).route(question)) == sorted(shards)
+
+
+def test_route_fans_out_when_hints_disagree():
+    assert sorted(ShardRouter(MANIFEST).route("Are funds better than shares?")) == sorted(MANIFEST["shards"])
+
+
+def write_manifest(db_path):
+    os.makedirs(db_path, exist_ok=True)
+    with open(os.path.join(db_path, SHARDS_MANIFEST), 'w', encoding='utf-8') as f:
+        json.dump(MANIFEST, f)
+
+
+def test_rebuild_rejects_unknown_shard(tmp_path):
+    db = str(tmp_path / 'db')
+    write_manifest(db)
+
+    with pytest.raises(ValueError, match="Unknown shard 'equit'"):
+        rebuild_shard(str(tmp_path), db, 'equit', None, None)
+    with open(os.path.join(db, SHARDS_MANIFEST), encoding='utf-8') as f:
+        assert json.load(f) == MANIFEST
+
+
+def test_snapshot_shard_rebuild_typo_leaves_nothing_behind(tmp_path):
+    db = str(tmp_path / 'db')
+    write_manifest(snapshot_path(db, 'v1'))
+    publish(db, 'v1')
+
+    with pytest.raises(ValueError, match='Unknown shard'):
+        build_snapshot(str(tmp_path), db, None, None, shard='equit')
+    assert os.listdir(os.path.join(db, 'snapshots')) == ['v1']
+    assert snapshots.current_version(db) == 'v1'
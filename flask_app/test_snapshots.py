@@ -0,0 +1,180 @@
+import json
+import os
+import threading
+import time
+
+import pytest
+
+import snapshots
+from snapshots import LiveIndex, current_version, gc_snapshots, load_history, publish, snapshot_path
+
+
+def make_snapshot(db_path, version):
+    path = snapshot_path(db_path, version)
+    os.makedirs(path)
+    with open(os.path.join(path, 'shards.json'), 'w', encoding='utf-8') as f:
+        json.dump({"ticker_groups": {}, "shards": {}}, f)
+    return path
+
+
+def publish_at(db_path, versions):
+    """Publish versions in order, the i-th at time 1000 * (i + 1)"""
+    history = []
+    for i, version in enumerate(versions):
+        if not os.path.isdir(snapshot_path(db_path, version)):
+            make_snapshot(db_path, version)
+        publish(db_path, version)
+        history.append({"version": version, "published_at": 1000.0 * (i + 1)})
+    with open(os.path.join(db_path, 'history.json'), 'w', encoding='utf-8') as f:
+        json.dump(history, f)
+
+
+def on_disk(db_path):
+    return sorted(os.listdir(os.path.join(db_path, 'snapshots')))
+
+
+def test_gc_keeps_current_and_last_published(tmp_path):
+    db = str(tmp_path)
+    publish_at(db, ['v1', 'v2', 'v3', 'v4', 'v5'])
+
+    removed = gc_snapshots(db, keep=2, grace_seconds=0, now=10000)
+
+    assert removed == ['v1', 'v2', 'v3']
+    assert on_disk(db) == ['v4', 'v5']
+    assert [entry["version"] for entry in load_history(db)] == ['v4', 'v5']
+
+
+def test_gc_waits_out_the_grace_period(tmp_path):
+    db = str(tmp_path)
+    publish_at(db, ['v1', 'v2', 'v3'])
+
+    # v1 was superseded at 2000 and v2 at 3000
+    assert gc_snapshots(db, keep=1, grace_seconds=600, now=2500) == []
+    assert gc_snapshots(db, keep=1, grace_seconds=600, now=2600) == ['v1']
+    assert gc_snapshots(db, keep=1, grace_seconds=600, now=3599) == []
+    assert gc_snapshots(db, keep=1, grace_seconds=600, now=3600) == ['v2']
+    assert on_disk(db) == ['v3']
+
+
+def test_gc_never_removes_a_rolled_back_current(tmp_path):
+    db = str(tmp_path)
+    publish_at(db, ['v1', 'v2', 'v3', 'v1'])
+
+    removed = gc_snapshots(db, keep=0, grace_seconds=0, now=10000)
+
+    assert current_version(db) == 'v1'
+    assert removed == ['v2', 'v3']
+    assert on_disk(db) == ['v1']
+
+
+def test_gc_republished_version_is_superseded_by_its_latest_successor(tmp_path):
+    db = str(tmp_path)
+    # v1 is published again at 3000 and replaced by v3 at 4000
+    publish_at(db, ['v1', 'v2', 'v1', 'v3'])
+
+    assert gc_snapshots(db, keep=1, grace_seconds=600, now=4500) == ['v2']
+    assert gc_snapshots(db, keep=1, grace_seconds=600, now=4600) == ['v1']
+
+
+def test_gc_removes_abandoned_builds_only_when_stale(tmp_path):
+    db = str(tmp_path)
+    publish_at(db, ['v1'])
+    fresh = make_snapshot(db, 'v2')
+    abandoned = make_snapshot(db, 'v0')
+    old = time.time() - 2 * 24 * 3600
+    os.utime(abandoned, (old, old))
+
+    assert gc_snapshots(db, keep=1, grace_seconds=0) == ['v0']
+    assert os.path.isdir(fresh)
+
+
+class Loader:
+    def __init__(self):
+        self.loaded = []
+
+    def __call__(self, version):
+        self.loaded.append(version)
+        return f"chain-{version}", f"facts-{version}"
+
+
+@pytest.fixture
+def released(monkeypatch):
+    paths = []
+    monkeypatch.setattr(snapshots, 'release_clients', paths.append)
+    return paths
+
+
+def test_live_index_serves_chain_and_facts_of_one_version(tmp_path, released):
+    db = str(tmp_path)
+    publish_at(db, ['v1'])
+    index = LiveIndex(db, Loader(), check_interval=0)
+
+    with index.use() as (version, chain, facts):
+        assert (version, chain, facts) == ('v1', 'chain-v1', 'facts-v1')
+
+
+def test_live_index_releases_superseded_snapshot_after_last_request(tmp_path, released):
+    db = str(tmp_path)
+    publish_at(db, ['v1', 'v2'])
+    publish(db, 'v1')
+    index = LiveIndex(db, Loader(), check_interval=0)
+
+    first = index.use()
+    second = index.use()
+    assert first.__enter__()[0] == 'v1'
+    assert second.__enter__()[0] == 'v1'
+
+    index._load('v2')
+    # New requests get the new snapshot while the old one is still in use
+    with index.use() as (version, chain, facts):
+        assert (version, chain, facts) == ('v2', 'chain-v2', 'facts-v2')
+    assert released == []
+
+    first.__exit__(None, None, None)
+    assert released == []
+    second.__exit__(None, None, None)
+    assert released == [snapshot_path(db, 'v1')]
+    assert index.stats() == {'swaps': 1, 'reload_failures': 0, 'loading': 0, 'in_flight': 0}
+
+
+def test_live_index_releases_idle_snapshot_on_swap(tmp_path, released):
+    db = str(tmp_path)
+    publish_at(db, ['v1', 'v2'])
+    publish(db, 'v1')
+    index = LiveIndex(db, Loader(), check_interval=0)
+
+    index._load('v2')
+
+    assert index.version == 'v2'
+    assert released == [snapshot_path(db, 'v1')]
+
+
+def test_live_index_keeps_serving_when_a_load_fails(tmp_path, released):
+    db = str(tmp_path)
+    publish_at(db, ['v1', 'v2'])
+    publish(db, 'v1')
+
+    def load(version):
+        if version == 'v2':
+            raise RuntimeError("corrupt snapshot")
+        return f"chain-{version}", f"facts-{version}"
+
+    index = LiveIndex(db, load, check_interval=0)
+    index._load('v2')
+
+    assert index.version == 'v1'
+    assert index.stats()['reload_failures'] == 1
+    assert released == []
+
+
+def test_fixed_live_index_serves_one_chain_and_never_releases(released):
+    index = LiveIndex.fixed("chain", version="v1", facts="facts")
+
+    with index.use() as (version, chain, facts):
+        assert (version, chain, facts) == ('v1', 'chain', 'facts')
+        assert index.stats()['in_flight'] == 1
+    assert index.version == 'v1'
+    assert index.stats() == {'swaps': 0, 'reload_failures': 0, 'loading': 0, 'in_flight': 0}
+    assert index.check_interval is None
+    assert released == []
+    assert not any(thread.name == 'index-watcher' for thread in threading.enumerate())
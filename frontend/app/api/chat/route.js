@@ -1,6 +1,10 @@
 import { NextResponse } from "next/server"
+import { randomUUID } from "crypto"
 
 export async function POST(req) {
+  // Reuse the caller's trace ID if it sent one so logs line up end to end
+  const traceId = req.headers.get("x-trace-id") || randomUUID()
+
   try {
     const body = await req.json()
     const { messages } = body
@@ -9,16 +13,23 @@ export async function POST(req) {
 
     const res = await fetch("http://127.0.0.1:5000/ask", {
       method: "POST",
-      headers: { "Content-Type": "application/json" },
+      headers: { "Content-Type": "application/json", "X-Trace-Id": traceId },
       body: JSON.stringify({ question: lastQuestion }),
     })
 
     const data = await res.json()
     const reply = data?.answer || "Sorry, I couldn't get a response."
+    const echoedTraceId = res.headers.get("x-trace-id") || traceId
 
-    return NextResponse.json({ reply })
+    return NextResponse.json(
+      { reply, traceId: echoedTraceId },
+      { headers: { "X-Trace-Id": echoedTraceId } }
+    )
   } catch (error) {
-    console.error("Chat API error:", error)
-    return NextResponse.json({ reply: "Oops! Something went wrong." }, { status: 500 })
+    console.error(`Chat API error (trace ${traceId}):`, error)
+    return NextResponse.json(
+      { reply: "Oops! Something went wrong.", traceId },
+      { status: 500, headers: { "X-Trace-Id": traceId } }
+    )
   }
 }
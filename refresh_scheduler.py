@@ -0,0 +1,194 @@
+"""Long-running scheduler that polls each source as often as it publishes.
+
+Every source keeps an estimate of how many new articles it publishes per
+hour, and its polling interval is set from that rate within bounds and
+with jitter. Quiet fund pages get visited rarely, and busy tickers get
+visited often. Only sources that are due are handed to scrape_source, and
+the schedule is kept on disk so a restart picks up where it left off.
+
+    python refresh_scheduler.py            # run forever
+    python refresh_scheduler.py --once     # scrape whatever is due, then exit
+"""
+import argparse
+import json
+import os
+import random
+import time
+from datetime import datetime
+
+from run_scraper import FinancialNewsScraper, SOURCES_CONFIG
+
+
+class RefreshScheduler:
+    def __init__(self, scraper, sources_config, state_path='scraped_mf/refresh_schedule.json',
+                 min_interval=15 * 60, max_interval=24 * 3600, initial_interval=3600,
+                 target_new_per_poll=1.0, smoothing=0.3, jitter=0.1, limit_per_source=5,
+                 seen_per_source=200):
+        self.scraper = scraper
+        self.sources = sources_config
+        self.state_path = state_path
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.initial_interval = initial_interval
+        self.target_new_per_poll = target_new_per_poll
+        self.smoothing = smoothing
+        self.jitter = jitter
+        self.limit_per_source = limit_per_source
+        self.seen_per_source = seen_per_source
+        self.state = self._load_state()
+
+    def _load_state(self):
+        if self.state_path and os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError) as e:
+                print(f"Starting with an empty schedule, could not read {self.state_path}: {str(e)}")
+        return {}
+
+    def save_state(self):
+        if not self.state_path:
+            return
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp_path, self.state_path)
+
+    def _source_state(self, source_name):
+        # New sources are due straight away
+        return self.state.setdefault(source_name, {
+            'next_due': 0,
+            'last_run': None,
+            'rate_per_hour': None,
+            'interval': self.initial_interval,
+            'runs': 0,
+            'fetched': 0,
+            'seen': [],
+            'listed': []
+        })
+
+    def due_sources(self, now=None):
+        now = time.time() if now is None else now
+        return [name for name in self.sources if self._source_state(name)['next_due'] <= now]
+
+    def seconds_until_next_due(self, now=None, cap=60):
+        now = time.time() if now is None else now
+        next_due = min((self._source_state(name)['next_due'] for name in self.sources), default=now + cap)
+        return max(0, min(cap, next_due - now))
+
+    def _next_interval(self, state):
+        rate = state['rate_per_hour']
+        if rate is None:
+            interval = self.initial_interval
+        elif rate <= 0:
+            interval = self.max_interval
+        else:
+            interval = self.target_new_per_poll / rate * 3600
+        interval = min(self.max_interval, max(self.min_interval, interval))
+        # Jitter keeps sources that share a site from lining up
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def record_poll(self, source_name, new_count, saturated=False, now=None):
+        """Fold one poll's result into the source's rate and reschedule it"""
+        now = time.time() if now is None else now
+        state = self._source_state(source_name)
+
+        # The first poll only tells us what already existed, not how fast it arrives
+        first_poll = state['last_run'] is None
+        if not first_poll:
+            elapsed_hours = max(now - state['last_run'], 1) / 3600
+            observed = new_count / elapsed_hours
+            if state['rate_per_hour'] is None:
+                state['rate_per_hour'] = observed
+            else:
+                state['rate_per_hour'] = (self.smoothing * observed
+                                          + (1 - self.smoothing) * state['rate_per_hour'])
+
+        state['interval'] = self._next_interval(state)
+        if saturated and not first_poll:
+            # More links arrived than one poll fetches, so come back sooner
+            state['interval'] = max(self.min_interval, state['interval'] / 2)
+        state['last_run'] = now
+        state['next_due'] = now + state['interval']
+        state['runs'] += 1
+
+    def poll(self, source_name):
+        source_config = self.sources[source_name]
+        state = self._source_state(source_name)
+        seen = set(state['seen'])
+
+        attempted, listed = [], []
+        articles = self.scraper.scrape_source(
+            source_name, source_config, self.limit_per_source, skip_urls=seen, attempted=attempted, listed=listed
+        )
+        self.scraper._save_articles(articles, source_name)
+
+        # Arrivals are links that were not on the page last time, however many of them we fetched
+        previous = set(state.get('listed') or state['seen'])
+        new_count = len(set(listed) - previous)
+        # Links that failed or were rejected count as seen too, or they would be retried every poll.
+        # On the first poll the whole existing listing is backlog, not news, so all of it is seen.
+        first_poll = state['last_run'] is None
+        marked = state['seen'] + attempted + (listed if first_poll else [])
+        state['seen'] = list(dict.fromkeys(marked))[-max(self.seen_per_source, len(set(listed))):]
+        state['listed'] = list(dict.fromkeys(listed))
+        state['fetched'] += len(articles)
+        self.record_poll(source_name, new_count, saturated=new_count > self.limit_per_source)
+        return articles
+
+    def run_due(self):
+        """Scrape every source that is due, then persist the schedule"""
+        articles = []
+        for source_name in self.due_sources():
+            print(f"Scraping from {source_name}...")
+            try:
+                articles.extend(self.poll(source_name))
+            except Exception as e:
+                print(f"Error scraping {source_name}: {str(e)}")
+                # Back off as if the source were quiet rather than hammering it
+                self.record_poll(source_name, 0)
+            finally:
+                self.save_state()
+            state = self.state[source_name]
+            print(f"Next poll of {source_name} in {state['interval'] / 60:.0f} min "
+                  f"({state['rate_per_hour'] or 0:.2f} new/h)")
+            # Respect the site by waiting between sources
+            time.sleep(random.uniform(2, 5))
+
+        self.scraper._save_profiles()
+        return articles
+
+    def run_forever(self):
+        while True:
+            self.run_due()
+            wait = self.seconds_until_next_due()
+            if wait > 0:
+                time.sleep(wait)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Adaptive per-source refresh scheduler")
+    parser.add_argument('--once', action='store_true', help='Scrape due sources once and exit')
+    parser.add_argument('--min-interval', type=int, default=15 * 60, help='Seconds')
+    parser.add_argument('--max-interval', type=int, default=24 * 3600, help='Seconds')
+    parser.add_argument('--limit-per-source', type=int, default=5)
+    args = parser.parse_args()
+
+    scheduler = RefreshScheduler(
+        FinancialNewsScraper(SOURCES_CONFIG), SOURCES_CONFIG,
+        min_interval=args.min_interval, max_interval=args.max_interval,
+        limit_per_source=args.limit_per_source
+    )
+    print(f"Scheduler started at {datetime.now().isoformat()}")
+    if args.once:
+        articles = scheduler.run_due()
+        print(f"Total articles scraped: {len(articles)}")
+    else:
+        try:
+            scheduler.run_forever()
+        except KeyboardInterrupt:
+            scheduler.save_state()
+
+
+if __name__ == "__main__":
+    main()
@@ -6,9 +6,45 @@ import random
 import json
 import os
 import re
+from extraction_profiles import ExtractionProfiles
+
+# Generic selectors tried when a source does not configure its own
+DATE_SELECTORS = [
+    'time', 
+    '.date', 
+    '.published', 
+    'meta[property="article:published_time"]', 
+    'meta[name="date"]'
+]
+AUTHOR_SELECTORS = [
+    '.author', 
+    '.byline', 
+    'meta[name="author"]',
+    'a[rel="author"]'
+]
+CONTENT_FALLBACK_SELECTORS = [
+    'article p',
+    '.article-body p',
+    '.story-content p',
+    '.article-content p'
+]
+DATE_FORMATS = [
+    '%Y-%m-%d', 
+    '%Y-%m-%dT%H:%M:%S', 
+    '%Y-%m-%d %H:%M:%S',
+    '%B %d, %Y',
+    '%b %d, %Y',
+    '%d %B %Y',
+    '%d/%m/%Y',
+    '%m/%d/%Y'
+]
+ISO_FORMAT = 'iso'
+
+# Seconds to wait on a page; a hung download must not hold a worker's lease forever
+REQUEST_TIMEOUT = 30
 
 class FinancialNewsScraper:
-    def __init__(self, sources_config):
+    def __init__(self, sources_config, profile_path='scraped_mf/extraction_profiles.json'):
         self.sources = sources_config
         self.headers = {
             'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
@@ -16,6 +52,9 @@ class FinancialNewsScraper:
         
         # Create directory for storing scraped articles
         os.makedirs('scraped_mf', exist_ok=True)
+
+        # Learned per-source selectors and date formats, tried before the full cascade
+        self.profiles = ExtractionProfiles(profile_path) if profile_path else None
     
     def scrape_all_sources(self, limit_per_source=10):
         """Scrape articles from all configured sources"""
@@ -35,18 +74,30 @@ class FinancialNewsScraper:
             except Exception as e:
                 print(f"Error scraping {source_name}: {str(e)}")
         
+        self._save_profiles()
         return all_articles
     
-    def scrape_source(self, source_name, source_config, limit):
-        """Scrape articles from a specific source"""
+    def scrape_source(self, source_name, source_config, limit, skip_urls=None, attempted=None, listed=None):
+        """Scrape articles from a specific source.
+
+        If given, listed receives every link on the source's page and attempted the links fetched.
+        """
         articles = []
         
         # Get URLs from the source's main page
         main_url = source_config['main_url']
         article_links = self._get_article_links(main_url, source_config)
+        if listed is not None:
+            listed.extend(article_links)
+        
+        # Don't re-download articles the caller already has
+        if skip_urls:
+            article_links = [link for link in article_links if link not in skip_urls]
         
         # Limit the number of articles to process
         article_links = article_links[:limit]
+        if attempted is not None:
+            attempted.extend(article_links)
         
         # Process each article
         for url in article_links:
@@ -64,7 +115,9 @@ class FinancialNewsScraper:
     
     def _get_article_links(self, main_url, source_config):
         """Extract article links from the main page"""
-        response = requests.get(main_url, headers=self.headers)
+        response = requests.get(main_url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+        # A 429 or 503 page is not an empty listing; let the caller retry or back off
+        response.raise_for_status()
         soup = BeautifulSoup(response.text, 'html.parser')
         
         links = []
@@ -124,44 +177,48 @@ class FinancialNewsScraper:
     def _parse_article(self, url, source_name, source_config):
         """Parse a single article using BeautifulSoup"""
         try:
-            response = requests.get(url, headers=self.headers)
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Extract article components based on source-specific selectors
-            article_selectors = source_config.get('article_selectors', {})
-            
-            # Title
-            title = self._extract_element_text(soup, article_selectors.get('title', 'h1'))
-            
-            # Content
-            content = self._extract_article_content(soup, article_selectors.get('content', 'article'))
-            
-            # Skip articles with little content
-            if not title or not content or len(content.split()) < 50:
-                return None
-            
-            # Extract date
-            publish_date = self._extract_publish_date(soup, article_selectors.get('date', None))
-            
-            # Extract authors
-            authors = self._extract_authors(soup, article_selectors.get('authors', None))
-            
-            # Extract metadata
-            data = {
-                'title': title,
-                'text': content,
-                'url': url,
-                'source': source_name,
-                'authors': authors,
-                'publish_date': publish_date,
-                'scraped_date': datetime.now().isoformat()
-            }
-            
-            return data
+            response = requests.get(url, headers=self.headers, timeout=REQUEST_TIMEOUT)
+            return self._extract_article(response.text, url, source_name, source_config)
         except Exception as e:
             print(f"Error downloading/parsing {url}: {str(e)}")
             return None
     
+    def _extract_article(self, html, url, source_name, source_config):
+        """Extract article fields from downloaded HTML"""
+        soup = BeautifulSoup(html, 'html.parser')
+        
+        # Extract article components based on source-specific selectors
+        article_selectors = source_config.get('article_selectors', {})
+        
+        # Title
+        title = self._extract_element_text(soup, article_selectors.get('title', 'h1'))
+        
+        # Content
+        content = self._extract_article_content(soup, article_selectors.get('content', 'article'), source_name)
+        
+        # Skip articles with little content
+        if not title or not content or len(content.split()) < 50:
+            return None
+        
+        # Extract date
+        publish_date = self._extract_publish_date(soup, article_selectors.get('date', None), source_name)
+        
+        # Extract authors
+        authors = self._extract_authors(soup, article_selectors.get('authors', None), source_name)
+        
+        # Extract metadata
+        data = {
+            'title': title,
+            'text': content,
+            'url': url,
+            'source': source_name,
+            'authors': authors,
+            'publish_date': publish_date,
+            'scraped_date': datetime.now().isoformat()
+        }
+        
+        return data
+    
     def _extract_element_text(self, soup, selector):
         """Extract text from an element"""
         if not selector:
@@ -172,12 +229,12 @@ class FinancialNewsScraper:
             return element.get_text().strip()
         return ""
     
-    def _extract_article_content(self, soup, content_selector):
+    def _extract_article_content(self, soup, content_selector, source_name=None):
         """Extract and clean article content"""
         content_elements = soup.select(content_selector)
         if not content_elements:
             # Fallback to paragraph extraction
-            content_elements = soup.select('article p, .article-body p, .story-content p, .article-content p')
+            content_elements = self._select_content_fallback(soup, source_name)
         
         # Extract text from all content elements
         content = []
@@ -198,103 +255,100 @@ class FinancialNewsScraper:
         
         return "\n\n".join(content)
     
-    def _extract_publish_date(self, soup, date_selector):
+    def _select_content_fallback(self, soup, source_name):
+        """Select content paragraphs with the generic selectors, learned winner first"""
+        preferred = self._preferred(source_name, 'content_fallback')
+        if preferred:
+            content_elements = soup.select(preferred)
+            if content_elements:
+                self._record(source_name, 'content_fallback', preferred)
+                return content_elements
+        
+        content_elements = soup.select(', '.join(CONTENT_FALLBACK_SELECTORS))
+        if content_elements:
+            # Learn which of the generic selectors actually matched
+            winner = next((s for s in CONTENT_FALLBACK_SELECTORS if soup.select_one(s)), None)
+            self._record(source_name, 'content_fallback', winner)
+        else:
+            self._record(source_name, 'content_fallback', None)
+        return content_elements
+    
+    def _extract_publish_date(self, soup, date_selector, source_name=None):
         """Extract publication date"""
         if not date_selector:
-            # Try common patterns for dates
-            date_selectors = [
-                'time', 
-                '.date', 
-                '.published', 
-                'meta[property="article:published_time"]', 
-                'meta[name="date"]'
-            ]
-            
-            for selector in date_selectors:
-                element = soup.select_one(selector)
-                if element:
-                    if element.name == 'meta':
-                        date_str = element.get('content')
-                    else:
-                        date_str = element.get('datetime', element.get_text())
-                    
-                    # Try to parse the date
-                    try:
-                        date_obj = self._parse_date_string(date_str)
-                        if date_obj:
-                            return date_obj.isoformat()
-                    except:
-                        continue
+            # Try common patterns for dates, starting with the one that worked last time
+            date_selectors = DATE_SELECTORS
+            if self.profiles and source_name:
+                date_selectors = self.profiles.ordered(source_name, 'date_selector', DATE_SELECTORS)
         else:
-            element = soup.select_one(date_selector)
+            date_selectors = [date_selector]
+        
+        preferred_format = self._preferred(source_name, 'date_format')
+        for selector in date_selectors:
+            element = soup.select_one(selector)
             if element:
-                date_str = element.get('datetime', element.get_text())
-                try:
-                    date_obj = self._parse_date_string(date_str)
-                    if date_obj:
-                        return date_obj.isoformat()
-                except:
-                    pass
+                if element.name == 'meta':
+                    date_str = element.get('content')
+                else:
+                    date_str = element.get('datetime', element.get_text())
+                
+                # Try to parse the date
+                date_obj, date_format = self._parse_date_string_with_format(date_str, preferred_format)
+                if date_obj:
+                    if not date_selector:
+                        self._record(source_name, 'date_selector', selector)
+                    self._record(source_name, 'date_format', date_format)
+                    return date_obj.isoformat()
         
         # No date found
+        if not date_selector:
+            self._record(source_name, 'date_selector', None)
         return None
     
-    def _parse_date_string(self, date_str):
-        """Try to parse date string in various formats"""
+    def _parse_date_string_with_format(self, date_str, preferred_format=None):
+        """Parse a date string, returning (datetime, format that matched)"""
         if not date_str:
-            return None
+            return None, None
             
         date_str = date_str.strip()
         
-        # ISO format
-        try:
-            return datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-        except:
-            pass
-        
-        # Try common formats
-        formats = [
-            '%Y-%m-%d', 
-            '%Y-%m-%dT%H:%M:%S', 
-            '%Y-%m-%d %H:%M:%S',
-            '%B %d, %Y',
-            '%b %d, %Y',
-            '%d %B %Y',
-            '%d/%m/%Y',
-            '%m/%d/%Y'
-        ]
+        # Try the format that worked for this source before the full cascade
+        formats = [ISO_FORMAT] + DATE_FORMATS
+        if preferred_format in formats:
+            formats.remove(preferred_format)
+            formats.insert(0, preferred_format)
         
         for fmt in formats:
             try:
-                return datetime.strptime(date_str, fmt)
-            except:
+                if fmt == ISO_FORMAT:
+                    return datetime.fromisoformat(date_str.replace('Z', '+00:00')), fmt
+                return datetime.strptime(date_str, fmt), fmt
+            except ValueError:
                 continue
                 
-        return None
+        return None, None
     
-    def _extract_authors(self, soup, authors_selector):
+    def _extract_authors(self, soup, authors_selector, source_name=None):
         """Extract authors from article"""
         authors = []
         
         if not authors_selector:
-            # Try common patterns for authors
-            author_selectors = [
-                '.author', 
-                '.byline', 
-                'meta[name="author"]',
-                'a[rel="author"]'
-            ]
+            # A learned selector that still matches saves running the whole cascade
+            preferred = self._preferred(source_name, 'authors_selector')
+            if preferred:
+                authors = self._collect_authors(soup, preferred)
             
-            for selector in author_selectors:
-                elements = soup.select(selector)
-                for element in elements:
-                    if element.name == 'meta':
-                        author = element.get('content', '').strip()
-                    else:
-                        author = element.get_text().strip()
-                        
-                    if author and len(author) < 100 and author not in authors:  # Avoid picking up non-author text
-                        authors.append(author)
+            if authors:
+                self._record(source_name, 'authors_selector', preferred)
+            else:
+                # Try common patterns for authors
+                winner = None
+                for selector in AUTHOR_SELECTORS:
+                    found = self._collect_authors(soup, selector, authors)
+                    if found and winner is None:
+                        winner = selector
+                    authors.extend(found)
+                self._record(source_name, 'authors_selector', winner)
         else:
             elements = soup.select(authors_selector)
             for element in elements:
@@ -315,6 +369,36 @@ class FinancialNewsScraper:
                 
         return cleaned_authors
     
+    def _collect_authors(self, soup, selector, seen=()):
+        """Author strings matched by one generic selector"""
+        authors = []
+        for element in soup.select(selector):
+            if element.name == 'meta':
+                author = element.get('content', '').strip()
+            else:
+                author = element.get_text().strip()
+                
+            if author and len(author) < 100 and author not in seen and author not in authors:  # Avoid picking up non-author text
+                authors.append(author)
+        return authors
+    
+    def _preferred(self, source_name, field):
+        if not self.profiles or not source_name:
+            return None
+        return self.profiles.preferred(source_name, field)
+    
+    def _record(self, source_name, field, winner):
+        if self.profiles and source_name:
+            self.profiles.record(source_name, field, winner)
+    
+    def _save_profiles(self):
+        """Persist learned profiles and report any that have stopped matching"""
+        if not self.profiles:
+            return
+        self.profiles.save()
+        for source_name, field, rate in self.profiles.stale():
+            print(f"Extraction profile for {source_name}/{field} looks stale ({rate:.0%} hit rate)")
+    
     def _save_articles(self, articles, source_name):
         """Save articles to JSON file"""
         if not articles:
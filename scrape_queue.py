@@ -0,0 +1,391 @@
+"""Coordinator/worker mode for the scraper on top of a SQLite job queue.
+
+The queue is single-host: every worker process runs on the machine that
+holds the database, on a local disk. It uses SQLite's WAL mode, which
+needs shared memory and file locking that network filesystems do not
+provide, so pointing workers on other nodes at the same file over NFS or
+SMB can corrupt or deadlock the queue.
+
+Sources and article URLs become jobs. Workers claim them under a lease,
+keep the lease alive with heartbeats while they work, and expired leases
+are put back in the queue. Each host can be claimed by one worker at a
+time, and must then rest for a politeness delay before its next claim,
+however many workers are running.
+
+    python scrape_queue.py enqueue --db scrape_queue.db
+    python scrape_queue.py work --db scrape_queue.db        # once per worker process on this host
+    python scrape_queue.py collect --db scrape_queue.db
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlparse
+
+import requests
+
+from run_scraper import FinancialNewsScraper, REQUEST_TIMEOUT, SOURCES_CONFIG
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    cycle TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    source TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    host TEXT NOT NULL,
+    priority INTEGER NOT NULL DEFAULT 0,
+    state TEXT NOT NULL DEFAULT 'pending',
+    lease_owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL DEFAULT 0,
+    last_error TEXT,
+    result TEXT,
+    dedupe_key TEXT UNIQUE
+);
+CREATE INDEX IF NOT EXISTS jobs_claimable ON jobs (state, priority DESC, id);
+CREATE TABLE IF NOT EXISTS hosts (
+    host TEXT PRIMARY KEY,
+    next_allowed REAL NOT NULL
+);
+"""
+
+SOURCE_JOB = 'source'
+ARTICLE_JOB = 'article'
+
+
+def _host(url):
+    return urlparse(url).netloc or url
+
+
+class WorkQueue:
+    """Durable job queue with leases, shared by the workers of one host through a local SQLite file"""
+
+    def __init__(self, db_path, max_attempts=3):
+        self.db_path = db_path
+        self.max_attempts = max_attempts
+        self._local = threading.local()
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self):
+        # One connection per thread, since heartbeats run on their own thread.
+        # WAL needs a local disk; see the module docstring.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _connect(self):
+        # BEGIN IMMEDIATE serialises writers across every worker process
+        return _Transaction(self._connection())
+
+    def enqueue(self, cycle, kind, source, payload, url, priority=0, dedupe_key=None):
+        """Add a job; returns False if a job with the same dedupe key already exists"""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO jobs (cycle, kind, source, payload, host, priority, dedupe_key) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cycle, kind, source, json.dumps(payload), _host(url), priority, dedupe_key)
+            )
+            return cursor.rowcount == 1
+
+    def claim(self, worker_id, lease_seconds=60):
+        """Lease the next job whose host is free, or return None"""
+        now = time.time()
+        with self._connect() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                "SELECT j.* FROM jobs j LEFT JOIN hosts h ON h.host = j.host "
+                "WHERE j.state = 'pending' AND j.not_before <= ? "
+                "AND (h.next_allowed IS NULL OR h.next_allowed <= ?) "
+                "ORDER BY j.priority DESC, j.id LIMIT 1",
+                (now, now)
+            ).fetchone()
+            if row is None:
+                return None
+
+            conn.execute(
+                "UPDATE jobs SET state = 'leased', lease_owner = ?, lease_expires = ?, "
+                "attempts = attempts + 1 WHERE id = ?",
+                (worker_id, now + lease_seconds, row['id'])
+            )
+            # The host stays busy until this job finishes or its lease runs out
+            conn.execute(
+                "INSERT INTO hosts (host, next_allowed) VALUES (?, ?) "
+                "ON CONFLICT(host) DO UPDATE SET next_allowed = excluded.next_allowed",
+                (row['host'], now + lease_seconds)
+            )
+            # The row was read before the update; report the job as it is now
+            job = dict(row, state='leased', lease_owner=worker_id, lease_expires=now + lease_seconds,
+                       attempts=row['attempts'] + 1)
+            job['payload'] = json.loads(job['payload'])
+            return job
+
+    def heartbeat(self, job_id, worker_id, lease_seconds=60):
+        """Extend a lease; returns False if the lease was lost to another worker"""
+        expires = time.time() + lease_seconds
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (expires, job_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                return False
+            conn.execute(
+                "UPDATE hosts SET next_allowed = MAX(next_allowed, ?) "
+                "WHERE host = (SELECT host FROM jobs WHERE id = ?)",
+                (expires, job_id)
+            )
+            return True
+
+    def complete(self, job_id, worker_id, result, politeness_delay=0.0):
+        """Store a job's result; returns False if the lease had already been lost"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = 'done', result = ?, lease_owner = NULL, lease_expires = NULL "
+                "WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (json.dumps(result), job_id, worker_id)
+            )
+            if cursor.rowcount != 1:
+                return False
+            self._release_host(conn, job_id, now + politeness_delay)
+            return True
+
+    def fail(self, job_id, worker_id, error, politeness_delay=0.0, retry_delay=30.0):
+        """Put a failed job back with a backoff, or give up after max_attempts"""
+        now = time.time()
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT attempts FROM jobs WHERE id = ? AND state = 'leased' AND lease_owner = ?",
+                (job_id, worker_id)
+            ).fetchone()
+            if row is None:
+                return False
+            state = 'failed' if row['attempts'] >= self.max_attempts else 'pending'
+            conn.execute(
+                "UPDATE jobs SET state = ?, last_error = ?, not_before = ?, lease_owner = NULL, "
+                "lease_expires = NULL WHERE id = ?",
+                (state, str(error), now + retry_delay * row['attempts'], job_id)
+            )
+            self._release_host(conn, job_id, now + politeness_delay)
+            return True
+
+    def _release_host(self, conn, job_id, next_allowed):
+        conn.execute(
+            "UPDATE hosts SET next_allowed = ? WHERE host = (SELECT host FROM jobs WHERE id = ?)",
+            (next_allowed, job_id)
+        )
+
+    def _requeue_expired(self, conn, now):
+        expired = conn.execute(
+            "SELECT id, host, attempts FROM jobs WHERE state = 'leased' AND lease_expires < ?", (now,)
+        ).fetchall()
+        for row in expired:
+            state = 'failed' if row['attempts'] >= self.max_attempts else 'pending'
+            conn.execute(
+                "UPDATE jobs SET state = ?, last_error = 'lease expired', lease_owner = NULL, "
+                "lease_expires = NULL WHERE id = ?",
+                (state, row['id'])
+            )
+            conn.execute("UPDATE hosts SET next_allowed = ? WHERE host = ?", (now, row['host']))
+        return len(expired)
+
+    def requeue_expired(self):
+        with self._connect() as conn:
+            return self._requeue_expired(conn, time.time())
+
+    def is_drained(self):
+        """True once no job is pending or leased"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM jobs WHERE state IN ('pending', 'leased')"
+            ).fetchone()
+            return row['n'] == 0
+
+    def done_articles(self, cycle=None):
+        """Finished article jobs, optionally for one cycle, oldest first"""
+        query = "SELECT id, cycle, source, result FROM jobs WHERE kind = ? AND state = 'done'"
+        params = [ARTICLE_JOB]
+        if cycle:
+            query += " AND cycle = ?"
+            params.append(cycle)
+        with self._connect() as conn:
+            return conn.execute(query + " ORDER BY id", params).fetchall()
+
+    def mark_collected(self, job_ids):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET state = 'collected' WHERE id = ?", [(job_id,) for job_id in job_ids]
+            )
+
+    def stats(self):
+        with self._connect() as conn:
+            rows = conn.execute("SELECT kind, state, COUNT(*) AS n FROM jobs GROUP BY kind, state").fetchall()
+            return {f"{row['kind']}_{row['state']}": row['n'] for row in rows}
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK around a block"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class _Heartbeat(threading.Thread):
+    """Keeps a job's lease alive while the worker is busy with it"""
+
+    def __init__(self, queue, job_id, worker_id, lease_seconds):
+        super().__init__(daemon=True)
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._done = threading.Event()
+
+    def run(self):
+        while not self._done.wait(self.lease_seconds / 3):
+            if not self.queue.heartbeat(self.job_id, self.worker_id, self.lease_seconds):
+                self.lost = True
+                return
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+def enqueue_sources(queue, sources_config, limit_per_source=5, cycle=None):
+    """Coordinator step: one job per configured source for a new cycle"""
+    cycle = cycle or datetime.now().strftime('%Y%m%d_%H%M%S')
+    for source_name, source_config in sources_config.items():
+        queue.enqueue(
+            cycle, SOURCE_JOB, source_name, {'limit': limit_per_source},
+            source_config['main_url'], priority=1, dedupe_key=f"{cycle}:{SOURCE_JOB}:{source_name}"
+        )
+    return cycle
+
+
+def _process(job, queue, scraper, sources_config):
+    source_config = sources_config[job['source']]
+
+    if job['kind'] == SOURCE_JOB:
+        links = scraper._get_article_links(source_config['main_url'], source_config)
+        links = links[:job['payload']['limit']]
+        for url in links:
+            queue.enqueue(
+                job['cycle'], ARTICLE_JOB, job['source'], {'url': url}, url,
+                dedupe_key=f"{job['cycle']}:{ARTICLE_JOB}:{url}"
+            )
+        return {'links': len(links)}
+
+    # Fetch here rather than through _parse_article, which swallows errors, so that
+    # failed downloads are retried with backoff instead of being stored as done
+    url = job['payload']['url']
+    response = requests.get(url, headers=scraper.headers, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return scraper._extract_article(response.text, url, job['source'], source_config)
+
+
+def run_worker(db_path, sources_config=SOURCES_CONFIG, worker_id=None, lease_seconds=60,
+               politeness=(1, 3), poll_interval=0.2, exit_when_drained=False, profile_path=None):
+    """Claim and process jobs until stopped (or until the queue drains)"""
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    queue = WorkQueue(db_path)
+    kwargs = {'profile_path': profile_path} if profile_path else {}
+    scraper = FinancialNewsScraper(sources_config, **kwargs)
+    processed = 0
+
+    try:
+        while True:
+            job = queue.claim(worker_id, lease_seconds)
+            if job is None:
+                if exit_when_drained and queue.is_drained():
+                    break
+                time.sleep(poll_interval)
+                continue
+
+            heartbeat = _Heartbeat(queue, job['id'], worker_id, lease_seconds)
+            heartbeat.start()
+            delay = random.uniform(*politeness)
+            try:
+                result = _process(job, queue, scraper, sources_config)
+            except Exception as e:
+                heartbeat.stop()
+                print(f"[{worker_id}] Error on {job['kind']} job {job['id']}: {str(e)}")
+                queue.fail(job['id'], worker_id, e, politeness_delay=delay)
+                continue
+
+            heartbeat.stop()
+            if heartbeat.lost or not queue.complete(job['id'], worker_id, result, politeness_delay=delay):
+                print(f"[{worker_id}] Lost lease on job {job['id']}, discarding result")
+            else:
+                processed += 1
+    except KeyboardInterrupt:
+        pass
+    finally:
+        scraper._save_profiles()
+
+    return processed
+
+
+def collect(queue, scraper, cycle=None):
+    """Coordinator step: save finished articles per source, like scrape_all_sources does"""
+    by_source = {}
+    job_ids = []
+    for row in queue.done_articles(cycle):
+        job_ids.append(row['id'])
+        article = json.loads(row['result'])
+        if article:
+            by_source.setdefault(row['source'], []).append(article)
+
+    for source_name, articles in by_source.items():
+        scraper._save_articles(articles, source_name)
+    queue.mark_collected(job_ids)
+    return sum(len(articles) for articles in by_source.values())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Distributed scraping over a shared job queue")
+    parser.add_argument('command', choices=['enqueue', 'work', 'collect', 'status'])
+    parser.add_argument('--db', default='scrape_queue.db')
+    parser.add_argument('--limit-per-source', type=int, default=5)
+    parser.add_argument('--cycle', help='Restrict collect to one cycle')
+    parser.add_argument('--lease-seconds', type=int, default=60)
+    parser.add_argument('--exit-when-drained', action='store_true')
+    args = parser.parse_args()
+
+    queue = WorkQueue(args.db)
+    if args.command == 'enqueue':
+        cycle = enqueue_sources(queue, SOURCES_CONFIG, args.limit_per_source)
+        print(f"Enqueued {len(SOURCES_CONFIG)} sources for cycle {cycle}")
+    elif args.command == 'work':
+        processed = run_worker(args.db, lease_seconds=args.lease_seconds,
+                               exit_when_drained=args.exit_when_drained)
+        print(f"Processed {processed} jobs")
+    elif args.command == 'collect':
+        total = collect(queue, FinancialNewsScraper(SOURCES_CONFIG), args.cycle)
+        print(f"Total articles scraped: {total}")
+    else:
+        print(json.dumps(queue.stats(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import threading
+
+import pytest
+
+import scrape_queue
+from scrape_queue import ARTICLE_JOB, SOURCE_JOB, WorkQueue, _Heartbeat
+
+
+class Clock:
+    """Stands in for the time module inside scrape_queue"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(scrape_queue, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return WorkQueue(str(tmp_path / 'queue.db'), max_attempts=3)
+
+
+def add(queue, url, priority=0, kind=ARTICLE_JOB):
+    assert queue.enqueue('c1', kind, 'src', {'url': url}, url, priority=priority, dedupe_key=f"c1:{kind}:{url}")
+
+
+def state(queue, job_id):
+    return dict(queue._connection().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+
+def test_enqueue_ignores_duplicates(queue):
+    add(queue, 'https://a.example/1')
+    assert not queue.enqueue('c1', ARTICLE_JOB, 'src', {}, 'https://a.example/1', dedupe_key='c1:article:https://a.example/1')
+    assert queue.stats() == {'article_pending': 1}
+
+
+def test_claim_takes_priority_then_fifo(queue):
+    add(queue, 'https://a.example/1')
+    add(queue, 'https://b.example/1')
+    add(queue, 'https://c.example/', priority=1, kind=SOURCE_JOB)
+
+    claimed = [queue.claim('w')['payload']['url'] for _ in range(3)]
+
+    assert claimed == ['https://c.example/', 'https://a.example/1', 'https://b.example/1']
+    assert queue.claim('w') is None
+
+
+def test_one_worker_per_host_and_politeness_delay(queue, clock):
+    add(queue, 'https://a.example/1')
+    add(queue, 'https://a.example/2')
+    add(queue, 'https://b.example/1')
+
+    first = queue.claim('w1')
+    # The other a.example job waits while its host is busy; b.example is free
+    assert queue.claim('w2')['payload']['url'] == 'https://b.example/1'
+    assert queue.claim('w3') is None
+
+    assert queue.complete(first['id'], 'w1', {'ok': True}, politeness_delay=5)
+    clock.now += 4.9
+    assert queue.claim('w3') is None
+    clock.now += 0.1
+    assert queue.claim('w3')['payload']['url'] == 'https://a.example/2'
+
+
+def test_expired_lease_is_requeued_and_old_owner_loses_it(queue, clock):
+    add(queue, 'https://a.example/1')
+    job = queue.claim('w1', lease_seconds=10)
+
+    clock.now += 10.5
+    again = queue.claim('w2', lease_seconds=10)
+
+    assert again['id'] == job['id']
+    assert again['attempts'] == 2
+    assert state(queue, job['id'])['lease_owner'] == 'w2'
+    # The first worker's late heartbeat, result or failure is refused
+    assert not queue.heartbeat(job['id'], 'w1')
+    assert not queue.complete(job['id'], 'w1', {'late': True})
+    assert not queue.fail(job['id'], 'w1', 'late')
+    assert queue.complete(job['id'], 'w2', {'ok': True})
+    assert state(queue, job['id'])['result'] == '{"ok": true}'
+
+
+def test_heartbeat_keeps_the_lease_and_the_host(queue, clock):
+    add(queue, 'https://a.example/1')
+    add(queue, 'https://a.example/2')
+    job = queue.claim('w1', lease_seconds=10)
+
+    for _ in range(5):
+        clock.now += 8
+        assert queue.heartbeat(job['id'], 'w1', lease_seconds=10)
+        assert queue.claim('w2', lease_seconds=10) is None
+
+    assert state(queue, job['id'])['state'] == 'leased'
+    assert state(queue, job['id'])['attempts'] == 1
+
+
+def test_expiry_after_max_attempts_fails_the_job(queue, clock):
+    add(queue, 'https://a.example/1')
+    for attempt in range(3):
+        job = queue.claim(f'w{attempt}', lease_seconds=10)
+        assert job['attempts'] == attempt + 1
+        clock.now += 11
+
+    assert queue.requeue_expired() == 1
+    assert state(queue, job['id'])['state'] == 'failed'
+    assert state(queue, job['id'])['last_error'] == 'lease expired'
+    assert queue.claim('w') is None
+    assert queue.is_drained()
+
+
+def test_fail_backs_off_then_gives_up(queue, clock):
+    add(queue, 'https://a.example/1')
+
+    job = queue.claim('w')
+    assert queue.fail(job['id'], 'w', RuntimeError('503'), retry_delay=30)
+    assert state(queue, job['id'])['state'] == 'pending'
+    clock.now += 29
+    assert queue.claim('w') is None
+    clock.now += 1
+    job = queue.claim('w')
+
+    # The backoff grows with the number of attempts
+    assert queue.fail(job['id'], 'w', RuntimeError('503'), retry_delay=30)
+    clock.now += 59
+    assert queue.claim('w') is None
+    clock.now += 1
+    job = queue.claim('w')
+
+    assert queue.fail(job['id'], 'w', RuntimeError('still 503'), retry_delay=30)
+    row = state(queue, job['id'])
+    assert (row['state'], row['attempts'], row['last_error']) == ('failed', 3, 'still 503')
+    clock.now += 1000
+    assert queue.claim('w') is None
+    assert queue.stats() == {'article_failed': 1}
+
+
+def test_heartbeat_thread_notices_a_lost_lease(queue, clock):
+    add(queue, 'https://a.example/1')
+    job = queue.claim('w1', lease_seconds=0.03)
+    heartbeat = _Heartbeat(queue, job['id'], 'w1', 0.03)
+
+    # Another worker takes over the expired lease before the first heartbeat
+    clock.now += 1
+    assert queue.claim('w2', lease_seconds=60)['id'] == job['id']
+    heartbeat.start()
+    heartbeat.join(5)
+
+    assert heartbeat.lost
+
+
+def test_concurrent_claims_never_share_a_job(queue):
+    urls = [f'https://host{i}.example/' for i in range(60)]
+    for url in urls:
+        add(queue, url)
+
+    claimed, lock = [], threading.Lock()
+
+    def work(worker_id):
+        # Each thread gets its own SQLite connection
+        while True:
+            job = queue.claim(worker_id, lease_seconds=600)
+            if job is None:
+                return
+            with lock:
+                claimed.append(job['id'])
+
+    threads = [threading.Thread(target=work, args=(f'w{i}',)) for i in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(30)
+
+    assert sorted(claimed) == list(range(1, len(urls) + 1))